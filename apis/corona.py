@@ -1,29 +1,118 @@
-from flask_restplus import Namespace, Resource
+import hashlib
+import json
+
+from datetime import datetime
+
+from flask import Response, request, stream_with_context
+from flask_restplus import Namespace, Resource, inputs, reqparse
+from werkzeug.http import http_date
 
 from northface import handlers
+from northface.utils import encoding, jobs
 
 
 api = Namespace("corona", description="Coronavirus endpoint.")
 
 
+def date_string(value):
+    """
+    Check a day in the format the data is partitioned by (MM-DD-YYYY).
+    """
+    datetime.strptime(value, "%m-%d-%Y")
+    return value
+
+
+country_parser = reqparse.RequestParser()
+country_parser.add_argument(
+    "country",
+    action="append",
+    help="Only include this country. Repeat for several countries.",
+)
+
+data_parser = country_parser.copy()
+data_parser.add_argument(
+    "format",
+    default="dict",
+    choices=encoding.FORMATS,
+    help="Response format. `arrow` is an Arrow IPC stream.",
+)
+data_parser.add_argument(
+    "since",
+    type=date_string,
+    help="Only return days after this one (MM-DD-YYYY).",
+)
+
+
+def country_params(args):
+    return {"country": args["country"]} if args["country"] else {}
+
+
+def get_latest():
+    return handlers.dict_handler(
+        {"resource": "corona", "action": "get_most_recent_date", "params": {}}
+    )
+
+
+def validators(latest, params):
+    """
+    ETag and Last-Modified for a response, derived from the latest date
+    that was ingested. The ETag also covers the params, since they change
+    the response.
+
+    :param str latest: The latest date ('%m/%d/%Y'), from `get_latest`.
+    :return tuple(dict, bool): The headers, and whether the client's copy
+                               is still current.
+    """
+    last_modified = datetime.strptime(latest, "%m/%d/%Y")
+    tag = json.dumps([latest, params], sort_keys=True)
+    etag = hashlib.sha256(tag.encode()).hexdigest()[:32]
+    headers = {
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": "no-cache",
+    }
+
+    if request.if_none_match:
+        return headers, request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        since = request.if_modified_since.replace(tzinfo=None)
+        return headers, since >= last_modified
+    return headers, False
+
+
 @api.route("/")
+@api.expect(data_parser)
 class Corona(Resource):
     def get(self):
         """
         Get the most recent data for the Coronavirus from John's Hopkins.
+        Send If-None-Match/If-Modified-Since to get a 304 if nothing new
+        was ingested, and `since` to only get the new days.
         """
-        query = {
-            "resource": "corona",
-            "action": "fetch_data",
-            "params": {},
-        }
+        args = data_parser.parse_args()
+        params = {**country_params(args), "format": args["format"]}
+        if args["since"]:
+            params["since"] = args["since"]
         try:
+            latest = get_latest()
+            headers, not_modified = validators(latest, params)
+            if not_modified:
+                return Response(status=304, headers=headers)
+            query = {
+                "resource": "corona",
+                "action": "fetch_data",
+                "params": params,
+            }
             response = handlers.dict_handler(query)
         except Exception as e:
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
             )
-        return response
+        raw = encoding.raw_body(response)
+        if raw:
+            body, mimetype = raw
+            return Response(body, mimetype=mimetype, headers=headers)
+        return response, 200, headers
 
 
 @api.route("/date")
@@ -46,21 +135,68 @@ class CoronaDate(Resource):
         return response
 
 
+plots_parser = country_parser.copy()
+plots_parser.add_argument(
+    "async",
+    type=inputs.boolean,
+    default=False,
+    help="Run in the background and return a job ID to poll.",
+)
+plots_parser.add_argument(
+    "format",
+    default="legacy",
+    choices=["legacy", "json", "binary"],
+    help="`json` and `binary` return one {map, chart, table} object; "
+    "`binary` sends numeric arrays as base64 typed arrays.",
+)
+
+
 @api.route("/plots")
+@api.expect(plots_parser)
 class CoronaPlots(Resource):
     def get(self):
         """
         Get the updated date for the Coronavirus from John's Hopkins.
         """
+        args = plots_parser.parse_args()
         query = {
             "resource": "corona",
             "action": "fetch_plots",
-            "params": {},
+            "params": {**country_params(args), "format": args["format"]},
+            "async": args["async"],
         }
         try:
             response = handlers.dict_handler(query)
+        except jobs.QueueFull as e:
+            api.abort(code=503, message=str(e))
         except Exception as e:
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
             )
+        raw = encoding.raw_body(response)
+        if raw:
+            body, mimetype = raw
+            return Response(body, mimetype=mimetype)
         return response
+
+
+@api.route("/stream")
+class CoronaStream(Resource):
+    def get(self):
+        """
+        Stream the data as newline-delimited JSON, one record per line.
+        """
+        query = {
+            "resource": "corona",
+            "action": "stream_data",
+            "params": {},
+        }
+        try:
+            response = handlers.dict_handler(query, stream=True)
+        except Exception as e:
+            api.abort(
+                code=500, message=f"The code ran, but there was an error: {e}"
+            )
+        return Response(
+            stream_with_context(response), mimetype=encoding.NDJSON_MIMETYPE
+        )
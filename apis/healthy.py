@@ -2,6 +2,8 @@ from flask_restplus import Namespace, Resource
 
 import datetime
 
+from northface import handlers
+
 
 api = Namespace("healthy", description="Health check.")
 
@@ -10,3 +12,21 @@ api = Namespace("healthy", description="Health check.")
 class HealthCheck(Resource):
     def get(self):
         return f"Healthy at {datetime.datetime.now().isoformat()}!"
+
+
+@api.route("/imports")
+class ImportCosts(Resource):
+    def get(self):
+        """
+        Report how long each resource module took to import.
+        """
+        return handlers.get_import_costs()
+
+
+@api.route("/cache")
+class CacheStats(Resource):
+    def get(self):
+        """
+        Report response cache hits and misses for this worker.
+        """
+        return handlers.get_cache_stats()
@@ -0,0 +1,45 @@
+from flask import Response
+from flask_restplus import Namespace, Resource
+
+from northface.utils import encoding, jobs
+
+
+api = Namespace("jobs", description="Poll the status of background jobs.")
+
+
+@api.route("/<string:job_id>")
+class JobStatus(Resource):
+    def get(self, job_id):
+        """
+        Get the status of a background job.
+        """
+        try:
+            response = jobs.get_status(job_id)
+        except KeyError as e:
+            api.abort(code=404, message=str(e))
+        return response
+
+
+@api.route("/<string:job_id>/result")
+class JobResult(Resource):
+    def get(self, job_id):
+        """
+        Get the result of a background job. Returns a 202 with the job's
+        status if it hasn't finished yet.
+        """
+        try:
+            status, result = jobs.get_result(job_id)
+        except KeyError as e:
+            api.abort(code=404, message=str(e))
+        except RuntimeError as e:
+            api.abort(
+                code=500, message=f"The code ran, but there was an error: {e}"
+            )
+
+        if status["status"] != jobs.SUCCEEDED:
+            return status, 202
+        raw = encoding.raw_body(result)
+        if raw:
+            body, mimetype = raw
+            return Response(body, mimetype=mimetype)
+        return result
@@ -1,10 +1,11 @@
 import logging
 import datetime
 
-from flask import request
+from flask import Response, current_app, request
 from flask_restplus import Namespace, Resource
 
 from northface import handlers
+from northface.utils import encoding, jobs
 
 api = Namespace("api", description="Legacy way to interact with Snowbird API.")
 
@@ -15,8 +16,16 @@ class LegacyAPIRequest(Resource):
         return f"Healthy at {datetime.datetime.now().isoformat()}!"
 
     def post(self):
-        """Run an action on a resource."""
+        """
+        Run an action on a resource. Set `async` to run it in the background
+        and poll /jobs/<job_id> for the result. Send a list of {resource,
+        action, params} queries to run them all concurrently in one round
+        trip.
+        """
         logging.warning("The /api/v1.0 endpoint is deprecated!")
+        if isinstance(request.json, list):
+            return self.post_batch(request.json)
+
         if (
             not request.json
             or "resource" not in request.json
@@ -34,11 +43,34 @@ class LegacyAPIRequest(Resource):
             "resource": request.json["resource"],
             "action": request.json["action"],
             "params": request.json.get("params", {}),
+            "async": request.json.get("async", False),
         }
         try:
-            response = handlers.dict_handler(query)
+            response = handlers.dict_handler(
+                query, context=current_app._get_current_object().app_context
+            )
+        except TypeError as e:
+            api.abort(code=400, message=f"Invalid request! {e}")
+        except jobs.QueueFull as e:
+            api.abort(code=503, message=str(e))
         except Exception as e:
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
             )
+        raw = encoding.raw_body(response)
+        if raw:
+            body, mimetype = raw
+            return Response(body, mimetype=mimetype)
+        return response
+
+    def post_batch(self, queries):
+        """
+        Run a batch of queries. Results and errors come back per query, in
+        the order the queries were sent.
+        """
+        app = current_app._get_current_object()
+        try:
+            response = handlers.batch_handler(queries, context=app.app_context)
+        except TypeError as e:
+            api.abort(code=400, message=f"Invalid request! {e}")
         return response
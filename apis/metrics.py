@@ -0,0 +1,20 @@
+from flask import Response
+from flask_restplus import Namespace, Resource
+
+from northface import handlers
+
+
+api = Namespace("metrics", description="Request metrics for Prometheus.")
+
+
+@api.route("/")
+class Metrics(Resource):
+    def get(self):
+        """
+        Get per resource/action request counts, errors and latency
+        histograms across all workers, in Prometheus text format.
+        """
+        return Response(
+            handlers.get_metrics(),
+            mimetype="text/plain; version=0.0.4; charset=utf-8",
+        )
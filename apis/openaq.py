@@ -1,12 +1,19 @@
-from flask_restplus import Namespace, Resource, reqparse
+from flask_restplus import Namespace, Resource, inputs, reqparse
 
 from northface import handlers
+from northface.utils import jobs
 
 
 api = Namespace("openaq", description="Extract data from Open AQ.",)
 
 parser = reqparse.RequestParser()
 parser.add_argument("date_string", type=str, help="Date string as YYYY-MM-DD.")
+parser.add_argument(
+    "async",
+    type=inputs.boolean,
+    default=False,
+    help="Run in the background and return a job ID to poll.",
+)
 
 
 @api.route("/")
@@ -21,9 +28,12 @@ class Extract(Resource):
             "resource": "openaq",
             "action": "extract",
             "params": {"date_string": args["date_string"]},
+            "async": args["async"],
         }
         try:
             response = handlers.dict_handler(query)
+        except jobs.QueueFull as e:
+            api.abort(code=503, message=str(e))
         except Exception as e:
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
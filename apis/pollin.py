@@ -1,21 +1,53 @@
-from flask_restplus import Namespace, Resource
+from flask import Response, stream_with_context
+from flask_restplus import Namespace, Resource, reqparse
 
 from northface import handlers
+from northface.utils import encoding
 
 
 api = Namespace("pollin", description="Pollin' for president endpoint.")
 
+data_parser = reqparse.RequestParser()
+data_parser.add_argument(
+    "format",
+    default="dict",
+    choices=encoding.FORMATS,
+    help="Response format. `arrow` is an Arrow IPC stream.",
+)
+
+polls_parser = reqparse.RequestParser()
+polls_parser.add_argument("candidate", help="Candidate name.")
+polls_parser.add_argument("state", help="State name.")
+polls_parser.add_argument("pollster", help="Pollster name.")
+polls_parser.add_argument(
+    "population", help="Population polled (e.g. `lv`, `rv`)."
+)
+polls_parser.add_argument(
+    "start_date", help="Only polls that ended on or after this day."
+)
+polls_parser.add_argument(
+    "end_date", help="Only polls that ended on or before this day."
+)
+polls_parser.add_argument(
+    "page", type=int, default=1, help="Page of results, starting at 1."
+)
+polls_parser.add_argument(
+    "page_size", type=int, default=100, help="Polls per page."
+)
+
 
 @api.route("/")
+@api.expect(data_parser)
 class Pollin(Resource):
     def get(self):
         """
         Get the most recent data for the Coronavirus from John's Hopkins.
         """
+        args = data_parser.parse_args()
         query = {
             "resource": "pollin",
             "action": "fetch_data",
-            "params": {},
+            "params": {"format": args["format"]},
         }
         try:
             response = handlers.dict_handler(query)
@@ -23,6 +55,10 @@ class Pollin(Resource):
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
             )
+        raw = encoding.raw_body(response)
+        if raw:
+            body, mimetype = raw
+            return Response(body, mimetype=mimetype)
         return response
 
 
@@ -44,3 +80,51 @@ class PollinDate(Resource):
                 code=500, message=f"The code ran, but there was an error: {e}"
             )
         return response
+
+
+@api.route("/stream")
+class PollinStream(Resource):
+    def get(self):
+        """
+        Stream the data as newline-delimited JSON, one record per line.
+        """
+        query = {
+            "resource": "pollin",
+            "action": "stream_data",
+            "params": {},
+        }
+        try:
+            response = handlers.dict_handler(query, stream=True)
+        except Exception as e:
+            api.abort(
+                code=500, message=f"The code ran, but there was an error: {e}"
+            )
+        return Response(
+            stream_with_context(response), mimetype=encoding.NDJSON_MIMETYPE
+        )
+
+
+@api.route("/polls")
+@api.expect(polls_parser)
+class PollinPolls(Resource):
+    def get(self):
+        """
+        Find polls by candidate, state, pollster, population and date range,
+        newest first, one page at a time.
+        """
+        args = polls_parser.parse_args()
+        query = {
+            "resource": "pollin",
+            "action": "query_polls",
+            "params": {k: v for k, v in args.items() if v is not None},
+        }
+        try:
+            response = handlers.dict_handler(query)
+        except ValueError as e:
+            api.abort(code=400, message=f"Invalid request! {e}")
+        except Exception as e:
+            api.abort(
+                code=500, message=f"The code ran, but there was an error: {e}"
+            )
+        body, mimetype = encoding.raw_body(response)
+        return Response(body, mimetype=mimetype)
@@ -0,0 +1,26 @@
+from flask import Response, request
+from flask_restplus import Namespace, Resource
+
+from northface.utils import profiling
+
+
+api = Namespace("profiles", description="Download request profiles.")
+
+
+@api.route("/<string:profile_id>")
+class Profile(Resource):
+    def get(self, profile_id):
+        """
+        Download the full report of a profiled request. Requires the same
+        X-Profile secret that was used to profile the request.
+        """
+        if not profiling.authorize(
+            request.headers.get(profiling.PROFILE_HEADER)
+        ):
+            api.abort(code=403, message="Invalid profiling secret!")
+
+        try:
+            report = profiling.load_report(profile_id)
+        except KeyError as e:
+            api.abort(code=404, message=str(e))
+        return Response(report, mimetype="text/plain")
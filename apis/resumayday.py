@@ -1,6 +1,7 @@
-from flask_restplus import Namespace, Resource, reqparse
+from flask_restplus import Namespace, Resource, inputs, reqparse
 
 from northface import handlers
+from northface.utils import jobs
 
 
 api = Namespace("resumayday", description="Let's find your next job.")
@@ -9,16 +10,23 @@ parser.add_argument("job_title", type=str, help="The title of a job.")
 parser.add_argument(
     "location", type=str, help="The name or zip code of a location."
 )
+async_parser = parser.copy()
+async_parser.add_argument(
+    "async",
+    type=inputs.boolean,
+    default=False,
+    help="Run in the background and return a job ID to poll.",
+)
 
 
 @api.route("/")
-@api.expect(parser)
+@api.expect(async_parser)
 class Resumayday(Resource):
     def get(self):
         """
         Find a job.
         """
-        args = parser.parse_args()
+        args = async_parser.parse_args()
         query = {
             "resource": "resumayday",
             "action": "fetch_jobs_w_keywords",
@@ -26,9 +34,12 @@ class Resumayday(Resource):
                 "job_title": args["job_title"],
                 "location": args["location"],
             },
+            "async": args["async"],
         }
         try:
             response = handlers.dict_handler(query)
+        except jobs.QueueFull as e:
+            api.abort(code=503, message=str(e))
         except Exception as e:
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
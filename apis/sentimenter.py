@@ -1,6 +1,7 @@
-from flask_restplus import Namespace, Resource, reqparse
+from flask_restplus import Namespace, Resource, inputs, reqparse
 
 from northface import handlers
+from northface.utils import jobs
 
 
 api = Namespace(
@@ -36,6 +37,12 @@ class SentimenterText(Resource):
 
 tweets_parser = reqparse.RequestParser()
 tweets_parser.add_argument("topic", type=str, help="A topic to query.")
+tweets_parser.add_argument(
+    "async",
+    type=inputs.boolean,
+    default=False,
+    help="Run in the background and return a job ID to poll.",
+)
 
 
 @api.route("/tweets/")
@@ -50,9 +57,12 @@ class SentimenterTweets(Resource):
             "resource": "sentimenter",
             "action": "get_tweets",
             "params": {"topic": args["topic"]},
+            "async": args["async"],
         }
         try:
             response = handlers.dict_handler(query)
+        except jobs.QueueFull as e:
+            api.abort(code=503, message=str(e))
         except Exception as e:
             api.abort(
                 code=500, message=f"The code ran, but there was an error: {e}"
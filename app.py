@@ -1,12 +1,13 @@
 import logging
 import os
 
-from flask import Flask
+from flask import Flask, request
 from flask_cors import CORS
 
 from flask_restplus import Api
 
 from database import db
+from northface.utils import profiling
 from apis import (
     legacy,
     keyme,
@@ -19,6 +20,9 @@ from apis import (
     zacks_todos,
     openaq,
     nurse,
+    jobs,
+    metrics,
+    profiles,
 )
 
 
@@ -47,6 +51,26 @@ with app.app_context():
         logging.warning(f"Tried to create the db but failed with error: {e}")
 
 
+@app.before_request
+def start_profiling():
+    """
+    Profile this request if it carries the profiling secret.
+    """
+    profiling.disable()
+    if profiling.authorize(request.headers.get(profiling.PROFILE_HEADER)):
+        profiling.enable(
+            memory=bool(request.headers.get(profiling.PROFILE_MEMORY_HEADER))
+        )
+
+
+@app.after_request
+def attach_profile(response):
+    report = profiling.disable()
+    if report:
+        response.headers.update(profiling.report_headers(report))
+    return response
+
+
 CORS(app, resources={r"/*": {"origins": "*"}})
 api = Api(app)
 
@@ -61,3 +85,6 @@ api.add_namespace(whatsmybill.api)
 api.add_namespace(zacks_todos.api)
 api.add_namespace(openaq.api)
 api.add_namespace(nurse.api)
+api.add_namespace(jobs.api)
+api.add_namespace(metrics.api)
+api.add_namespace(profiles.api)
@@ -2,18 +2,28 @@
 Extract, transform, and load COVID-19 data from John's Hopkins.
 """
 
+import base64
+import hashlib
+import io
 import json
 import logging
 import os
+import numpy as np
 import pandas as pd
 import plotly
 import plotly.graph_objs as go
 import plotly.express as px
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from tqdm import tqdm
 
-from northface.utils import blob
+from northface.utils import blob, cache, encoding, frames, manifest
+
+# ETL jobs (extract, transform, backfill, the consolidate/aggregate
+# rebuilds and render_plots) write to storage and can run for minutes, so
+# they're only available through the CLI.
+__all__ = ["fetch_data", "stream_data", "get_most_recent_date", "fetch_plots"]
 
 # Destination is driven by environmnet variables.
 provider = os.environ.get("CLOUD_SERVICE_PROVIDER", "aws")
@@ -21,11 +31,47 @@ provider = os.environ.get("CLOUD_SERVICE_PROVIDER", "aws")
 if provider == "gcp":
     EXTRACT_URI = "gs://snowbird-data/corona/raw"
     CLEAN_URI = "gs://snowbird-data/corona/clean"
+    CONSOLIDATED_URI = "gs://snowbird-data/corona/consolidated"
+    AGGREGATE_URI = "gs://snowbird-data/corona/aggregate/region_daily.parquet"
+    PLOTS_URI = "gs://snowbird-data/corona/plots"
 
 elif provider == "aws":
     EXTRACT_URI = "s3://snowbird-assets/corona/raw"
     CLEAN_URI = "s3://snowbird-assets/corona/clean"
+    CONSOLIDATED_URI = "s3://snowbird-assets/corona/consolidated"
+    AGGREGATE_URI = (
+        "s3://snowbird-assets/corona/aggregate/region_daily.parquet"
+    )
+    PLOTS_URI = "s3://snowbird-assets/corona/plots"
+
+elif provider == "local":
+    LOCAL_DATA_URI = os.environ.get("LOCAL_DATA_URI", "/tmp/snowbird-data")
+    EXTRACT_URI = f"{LOCAL_DATA_URI}/corona/raw"
+    CLEAN_URI = f"{LOCAL_DATA_URI}/corona/clean"
+    CONSOLIDATED_URI = f"{LOCAL_DATA_URI}/corona/consolidated"
+    AGGREGATE_URI = f"{LOCAL_DATA_URI}/corona/aggregate/region_daily.parquet"
+    PLOTS_URI = f"{LOCAL_DATA_URI}/corona/plots"
+    for uri in [
+        EXTRACT_URI,
+        CLEAN_URI,
+        CONSOLIDATED_URI,
+        os.path.dirname(AGGREGATE_URI),
+        PLOTS_URI,
+    ]:
+        os.makedirs(uri, exist_ok=True)
+
 
+# New data lands once a day, so reads can be cached for a while.
+CACHE_TTL = int(os.environ.get("CORONA_CACHE_TTL", "3600"))
+
+# How many files to read from blob storage at once.
+READ_WORKERS = int(os.environ.get("CORONA_READ_WORKERS", "16"))
+
+# Processes used to extract and transform days in a backfill.
+BACKFILL_WORKERS = int(os.environ.get("CORONA_BACKFILL_WORKERS", "4"))
+
+# Rows per chunk when streaming data as newline-delimited JSON.
+STREAM_CHUNKSIZE = int(os.environ.get("STREAM_CHUNKSIZE", "5000"))
 
 GITHUB_BASE_URL = (
     "https://raw.githubusercontent.com/"
@@ -49,16 +95,17 @@ RENAME_COLUMNS = {
     "Recovered": "recovered",
 }
 
+# Compact in-memory types: the full history is held by every worker.
 DEFAULT_TYPE_COLUMNS = {
-    "state": "object",
-    "region": "object",
-    "last_update": "datetime64",
-    "confirmed": "float",
-    "deaths": "float",
-    "recovered": "float",
-    "dt": "object",
-    "lat": "object",
-    "lon": "object",
+    "state": "category",
+    "region": "category",
+    "last_update": "datetime64[ns]",
+    "confirmed": "float32",
+    "deaths": "float32",
+    "recovered": "float32",
+    "dt": "datetime64[ns]",
+    "lat": "float32",
+    "lon": "float32",
 }
 
 RENAME_REGION_VALUES = {
@@ -67,7 +114,44 @@ RENAME_REGION_VALUES = {
     "Republic of Korea": "South Korea",
 }
 
-LATLON_CLEANUP_VALUES = {0: ""}
+LATLON_CLEANUP_VALUES = {0: float("nan")}
+
+# Plot combinations rendered ahead of time on every ingest. Anything else
+# is rendered on demand and kept in the response cache.
+DEFAULT_PLOTS = [
+    {"country": None, "chart_type": None, "y_axis": y_axis}
+    for y_axis in ["deaths_pcent", "recovered_pcent", "active_pcent"]
+]
+# `legacy` is a JSON string of a list of three JSON strings (map, chart,
+# table). `json` is one {map, chart, table} object with plain arrays, and
+# `binary` the same object with numeric arrays as base64 typed arrays
+# ({dtype, bdata}), which plotly.js reads directly.
+PLOT_FORMATS = ["legacy", "json", "binary"]
+# plotly.js typed arrays don't support 64-bit integers.
+TYPED_ARRAY_DTYPES = {"f8", "f4", "i4", "u4", "i2", "u2", "i1", "u1"}
+
+# Columns needed to build the region/day aggregate.
+AGGREGATE_SOURCE_COLUMNS = [
+    "region",
+    "dt",
+    "confirmed",
+    "deaths",
+    "recovered",
+    "lat",
+    "lon",
+]
+
+# Schema of the consolidated dataset. The clean CSVs are also appended to a
+# typed Parquet dataset, one file per month, so reading the whole history
+# is a handful of reads instead of one CSV per day.
+CONSOLIDATED_STRING_COLUMNS = ["state", "region", "last_update", "dt"]
+CONSOLIDATED_NUMERIC_COLUMNS = [
+    "lat",
+    "lon",
+    "confirmed",
+    "deaths",
+    "recovered",
+]
 
 
 def extract(
@@ -89,73 +173,61 @@ def extract(
     return out_uri
 
 
-def rename_df(df, column_mapping=RENAME_COLUMNS, hard=False):
+def normalize_df(
+    df,
+    column_mapping=RENAME_COLUMNS,
+    region_mapping=RENAME_REGION_VALUES,
+    lat_lon_replacements=LATLON_CLEANUP_VALUES,
+):
     """
-    Rename the columns of a Dataframe
-
-    :param pandas.DataFrame df: Pandas df.
-    :param dict column_mapping: Dictionary of column Name:Rename
-    :param bool hard: Delete columns not in the mapping if they don't exist.
-    :return pandas.DataFrame: Df of renamed columns
+    Normalize a daily file to the clean schema in one pass. The JHU files
+    changed column names over time; every known spelling is renamed, extra
+    columns are dropped and missing ones are added empty.
+
+    :param pandas.DataFrame df: Raw daily data.
+    :param dict column_mapping: Dict of {"Raw Name": "clean_name"}
+    :param dict region_mapping: Dict of {"Old Region": "New Region"}
+    :param dict lat_lon_replacements: Dict of {"Old Val": "New Val"}
+    :return pandas.DataFrame: Df with the clean columns.
     """
-
-    for column in df.columns:
-        if column in column_mapping.keys():
-            new_name = column_mapping[column]
-            df[new_name] = df[column]
-
-        if hard:
-            del df[column]
-
-    return df
+    df = df.rename(columns=column_mapping)
+    # A file could carry two spellings of the same column; keep the first.
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.reindex(columns=list(dict.fromkeys(column_mapping.values())))
+    return df.replace(
+        {
+            "region": region_mapping,
+            "lat": lat_lon_replacements,
+            "lon": lat_lon_replacements,
+        }
+    )
 
 
-def add_columns(df, column_mapping=RENAME_COLUMNS):
+def set_types(df, as_types=DEFAULT_TYPE_COLUMNS):
     """
-    Add columns that don't exist to a pandas Dataframe.
+    Cast columns to their types. Values that can't be parsed become null
+    rather than failing the whole file.
 
     :param pandas.DataFrame df: Pandas df.
-    :param dict column_mapping: Dictionary of column Name:Rename
+    :param dict as_types: Dict of {"column": "type"}
     """
-
-    for column in set(column_mapping.values()):
+    for column, dtype in as_types.items():
         if column not in df.columns:
-            df[column] = ""
-
-    return df
-
-
-def rename_regions(
-    df, column_mapping=RENAME_REGION_VALUES, region_column="region"
-):
-    """
-    Rename values in the `region` column.
-
-    :param pandas.DataFrame df: DF with a `region` column.
-    :param dict column_mapping: Dict of {"Old Name": "New Name"}
-    """
-
-    for old_name, new_name in column_mapping.items():
-        df[region_column] = df[region_column].replace(old_name, new_name)
-
-    return df
-
-
-def clean_latlon(
-    df,
-    lat_lon_replacements=LATLON_CLEANUP_VALUES,
-    lat_lon_columns=["lat", "lon"],
-):
-    """
-    Clean up latitude and longitude columns.
-
-    :param pandas.DataFrame df: DF with a `region` column.
-    :param dict column_mapping: Dict of {"Old Val": "New Val"}
-    """
-
-    for column in lat_lon_columns:
-        for old_value, new_value in lat_lon_replacements.items():
-            df[column] = df[column].replace(old_value, new_value)
+            continue
+        if str(dtype).startswith("datetime"):
+            # JHU files mix formats (e.g. "3/8/20 5:31" and
+            # "2020-03-08T14:53:03"), sometimes within one file.
+            df[column] = pd.to_datetime(
+                df[column], errors="coerce", format="mixed"
+            )
+        elif dtype in ("float", "int") or str(dtype).startswith(
+            ("float", "int")
+        ):
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(
+                dtype
+            )
+        else:
+            df[column] = df[column].astype(dtype)
 
     return df
 
@@ -169,22 +241,30 @@ def transform(
     rename_columns=RENAME_COLUMNS,
     rename_regions_columns=RENAME_REGION_VALUES,
     file_type=".csv",
+    consolidated_uri=CONSOLIDATED_URI,
+    aggregate_uri=AGGREGATE_URI,
+    plots_uri=PLOTS_URI,
+    update_manifest=True,
 ):
     """
     Read a file from cloud storage into a pandas df, add a column with the
-    timestamp,and write it back to cloud storage.
+    timestamp,and write it back to cloud storage. The day is recorded in
+    the dataset's manifest, appended to the consolidated dataset and the
+    region/day aggregate, and the default plots are rendered.
 
     :param str date_string: The date you want to extract as a string
                             ('%m-%d-%Y').
+    :param bool update_manifest: Record the day in the manifest.
     """
     in_uri = os.path.join(in_uri, date_string + file_type)
     logging.info(f"Reading from {in_uri}...")
     df = pd.read_csv(in_uri)
 
-    filtered_df = rename_df(df, column_mapping=rename_columns, hard=True)
-    filtered_df = add_columns(df, column_mapping=rename_columns)
-    filtered_df = clean_latlon(df, lat_lon_replacements=LATLON_CLEANUP_VALUES)
-    filtered_df = rename_regions(df, column_mapping=rename_regions_columns)
+    filtered_df = normalize_df(
+        df,
+        column_mapping=rename_columns,
+        region_mapping=rename_regions_columns,
+    )
     filtered_df[ts_column_name] = datetime.strptime(
         date_string, "%m-%d-%Y"
     ).strftime(
@@ -192,57 +272,565 @@ def transform(
     )  # TODO: Standardize this
 
     if as_types:
-        filtered_df.astype(as_types)
+        filtered_df = set_types(filtered_df, as_types)
 
     out_uri = os.path.join(out_uri, date_string + file_type)
     logging.info(f"Writing to {out_uri}...")
-    filtered_df.to_csv(out_uri, index=False)
+    data = filtered_df.to_csv(index=False)
+    blob.write_file(out_uri, data)
+    if update_manifest:
+        manifest.add_partitions(
+            os.path.dirname(out_uri),
+            [_describe_clean(date_string, out_uri, data, len(filtered_df))],
+            date_format="%m-%d-%Y",
+        )
+
+    if consolidated_uri:
+        consolidate(
+            date_string,
+            clean_uri=os.path.dirname(out_uri),
+            consolidated_uri=consolidated_uri,
+            file_type=file_type,
+        )
+
+    if aggregate_uri:
+        update_aggregate(
+            date_string,
+            clean_uri=os.path.dirname(out_uri),
+            aggregate_uri=aggregate_uri,
+            file_type=file_type,
+        )
+
+    if plots_uri and aggregate_uri:
+        render_plots(
+            base_uri=os.path.dirname(out_uri),
+            aggregate_uri=aggregate_uri,
+            plots_uri=plots_uri,
+        )
 
     return out_uri
 
 
-def fetch_data(date=None, base_uri=CLEAN_URI, file_type=".csv"):
+def backfill(
+    start_date,
+    end_date,
+    max_workers=BACKFILL_WORKERS,
+    extract_data=True,
+    overwrite=False,
+    base_uri=CLEAN_URI,
+    file_type=".csv",
+):
+    """
+    Extract and transform a range of days in parallel, then rebuild the
+    consolidated dataset, the aggregate and the default plots once at the
+    end. Days already in the clean dataset are skipped unless `overwrite`.
+
+    :param str start_date: First day to load ('%m-%d-%Y').
+    :param str end_date: Last day to load, inclusive ('%m-%d-%Y').
+    :param int max_workers: Number of processes to use.
+    :param bool extract_data: Download the raw files from Github first.
+    :param bool overwrite: Reload days that are already in the clean data.
+    :return dict: The days loaded, skipped, and failed (with their errors).
+    """
+    dates = [
+        dt.strftime("%m-%d-%Y")
+        for dt in pd.date_range(
+            datetime.strptime(start_date, "%m-%d-%Y"),
+            datetime.strptime(end_date, "%m-%d-%Y"),
+        )
+    ]
+    existing = set()
+    if not overwrite:
+        existing = {
+            os.path.splitext(os.path.basename(k))[0]
+            for k in _get_clean_keys(base_uri=base_uri)
+        }
+
+    loaded, partitions, failed = [], [], {}
+    todo = [date for date in dates if date not in existing]
+    with ProcessPoolExecutor(max_workers=int(max_workers)) as executor:
+        futures = {
+            executor.submit(
+                _backfill_day, date, extract_data, base_uri, file_type
+            ): date
+            for date in todo
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            date = futures[future]
+            try:
+                partitions.append(future.result())
+                loaded.append(date)
+            except Exception as e:
+                logging.error(f"Couldn't load {date}: {e}")
+                failed[date] = str(e)
+
+    if loaded:
+        # Workers run in parallel, so the manifest is written once here.
+        manifest.add_partitions(base_uri, partitions, date_format="%m-%d-%Y")
+        rebuild_consolidated(clean_uri=base_uri, file_type=file_type)
+        rebuild_aggregate(base_uri=base_uri)
+        render_plots(base_uri=base_uri)
+
+    return {
+        "loaded": sorted(loaded, key=_get_key_date),
+        "skipped": [date for date in dates if date in existing],
+        "failed": failed,
+    }
+
+
+def _backfill_day(date_string, extract_data, base_uri, file_type):
+    """
+    Load one day of a backfill. The shared datasets are rebuilt once the
+    whole range is done, so they're skipped here.
+
+    :return dict: The day's manifest partition.
+    """
+    if extract_data:
+        extract(date_string, file_type=file_type)
+    out_uri = transform(
+        date_string,
+        out_uri=base_uri,
+        file_type=file_type,
+        consolidated_uri=None,
+        aggregate_uri=None,
+        plots_uri=None,
+        update_manifest=False,
+    )
+    data = blob.read_file(out_uri)
+    rows = len(pd.read_csv(io.BytesIO(data), usecols=["dt"]))
+    return _describe_clean(date_string, out_uri, data, rows)
+
+
+def _describe_clean(date_string, uri, data, rows):
+    """
+    Describe a clean daily file for the manifest.
+    """
+    return manifest.describe(
+        date_string,
+        uri,
+        data,
+        rows=rows,
+        date=datetime.strptime(date_string, "%m-%d-%Y"),
+    )
+
+
+def consolidate(
+    date_string,
+    clean_uri=CLEAN_URI,
+    consolidated_uri=CONSOLIDATED_URI,
+    file_type=".csv",
+):
+    """
+    Append one day of clean data to the consolidated dataset, replacing
+    that day if it was already there.
+
+    :param str date_string: The date to consolidate ('%m-%d-%Y').
+    """
+    df = pd.read_csv(os.path.join(clean_uri, date_string + file_type))
+    month_uri = _get_month_uri(date_string, consolidated_uri)
+
+    try:
+        existing = pd.read_parquet(month_uri)
+        existing = existing[existing["dt"] != df["dt"].iloc[0]]
+        df = pd.concat([existing, df])
+    except FileNotFoundError:
+        pass
+
+    logging.info(f"Writing to {month_uri}...")
+    _write_consolidated(df, month_uri)
+    return month_uri
+
+
+def rebuild_consolidated(
+    clean_uri=CLEAN_URI, consolidated_uri=CONSOLIDATED_URI, file_type=".csv"
+):
+    """
+    Rebuild the whole consolidated dataset from the clean CSVs.
+    """
+    months = {}
+    for key in _get_clean_keys(base_uri=clean_uri, file_type=file_type):
+        date_string = os.path.splitext(os.path.basename(key))[0]
+        month_uri = _get_month_uri(date_string, consolidated_uri)
+        months.setdefault(month_uri, []).append(
+            os.path.join(clean_uri, os.path.basename(key))
+        )
+
+    for month_uri, paths in tqdm(sorted(months.items())):
+        df = pd.concat(frames.read_many(paths, max_workers=READ_WORKERS))
+        _write_consolidated(df, month_uri)
+
+    return sorted(months.keys())
+
+
+def update_aggregate(
+    date_string,
+    clean_uri=CLEAN_URI,
+    aggregate_uri=AGGREGATE_URI,
+    file_type=".csv",
+):
+    """
+    Add one day to the region/day aggregate, replacing that day if it was
+    already there. Only the new day is aggregated.
+
+    :param str date_string: The date to add ('%m-%d-%Y').
+    """
+    day = _aggregate(
+        set_types(
+            pd.read_csv(os.path.join(clean_uri, date_string + file_type))
+        )
+    )
+
+    try:
+        existing = set_types(pd.read_parquet(aggregate_uri))
+        existing = existing[~existing["dt"].isin(day["dt"].unique())]
+        day = pd.concat([existing, day])
+    except FileNotFoundError:
+        pass
+
+    logging.info(f"Writing to {aggregate_uri}...")
+    _write_aggregate(day, aggregate_uri)
+    return aggregate_uri
+
+
+def rebuild_aggregate(base_uri=CLEAN_URI, aggregate_uri=AGGREGATE_URI):
+    """
+    Rebuild the whole region/day aggregate from the full history.
+    """
+    df = _read_data(
+        base_uri=base_uri,
+        columns=AGGREGATE_SOURCE_COLUMNS,
+    )
+    _write_aggregate(_aggregate(df), aggregate_uri)
+    return aggregate_uri
+
+
+def _aggregate(df):
+    """
+    Sum clean data up to one row per region per day, in float64.
+    """
+    df = frames.upcast_floats(df)
+    df = df.groupby(["region", "dt"], as_index=False, observed=True).agg(
+        confirmed=("confirmed", "sum"),
+        deaths=("deaths", "sum"),
+        recovered=("recovered", "sum"),
+        lat=("lat", "mean"),
+        lon=("lon", "mean"),
+    )
+    return _add_derived_columns(df)
+
+
+def _add_derived_columns(df):
+    """
+    Add the percentage and `active` columns used by the plots.
+    """
+    df["recovered_pcent"] = (df["recovered"] / df["confirmed"]) * 100
+    df["deaths_pcent"] = (df["deaths"] / df["confirmed"]) * 100
+    df["active"] = df["confirmed"] - (df["deaths"] + df["recovered"])
+    df["active_pcent"] = (df["active"] / df["confirmed"]) * 100
+    return df
+
+
+def _write_aggregate(df, uri):
+    df = df.sort_values(["region", "dt"]).reset_index(drop=True)
+    _write_parquet(df, uri)
+
+
+def _write_parquet(df, uri):
+    """
+    Write a frame with one row group per region, and record it in the
+    dataset's manifest.
+    """
+    data = frames.to_grouped_parquet(df, "region")
+    blob.write_file(uri, data)
+    name = os.path.splitext(os.path.basename(uri))[0]
+    manifest.add_partitions(
+        os.path.dirname(uri),
+        [manifest.describe(name, uri, data, rows=len(df))],
+    )
+
+
+def _read_aggregate(
+    aggregate_uri=AGGREGATE_URI, base_uri=CLEAN_URI, country=None
+):
+    """
+    Read the region/day aggregate, building it from the full history if it
+    doesn't exist yet.
+
+    :param list country: Only read these regions.
+    """
+    country = _parse_country(country)
+    try:
+        df = pd.read_parquet(
+            aggregate_uri,
+            filters=[("region", "in", country)] if country else None,
+        )
+        return set_types(df)
+    except FileNotFoundError:
+        logging.warning(f"No aggregate at {aggregate_uri}! Building it...")
+        return _aggregate(
+            _read_data(
+                base_uri=base_uri,
+                columns=AGGREGATE_SOURCE_COLUMNS,
+                country=country,
+            )
+        )
+
+
+def _parse_country(country):
+    """
+    Normalize a country filter to a list of regions (or None for all).
+
+    :param country: A region or a list of regions. Some region names
+                    contain commas (e.g. "Bahamas, The"), so strings aren't
+                    split.
+    """
+    if not country:
+        return None
+    if isinstance(country, str):
+        country = [country]
+    return sorted({c.strip() for c in country if c.strip()}) or None
+
+
+def _get_month_uri(date_string, consolidated_uri=CONSOLIDATED_URI):
+    """
+    Get the URI of the monthly Parquet file a day belongs to.
+
+    :param str date_string: The date ('%m-%d-%Y').
+    """
+    month = datetime.strptime(date_string, "%m-%d-%Y").strftime("%Y-%m")
+    return f"{consolidated_uri}/{month}.parquet"
+
+
+def _write_consolidated(df, uri):
+    """
+    Write a typed frame to the consolidated dataset, with one row group per
+    region so country queries only read that country's rows.
+    """
+    df = df.reindex(
+        columns=CONSOLIDATED_STRING_COLUMNS + CONSOLIDATED_NUMERIC_COLUMNS
+    )
+    for column in CONSOLIDATED_STRING_COLUMNS:
+        df[column] = df[column].where(
+            df[column].isna(), df[column].astype(str)
+        )
+    for column in CONSOLIDATED_NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype(
+            "float32"
+        )
+    df = df.sort_values(["region", "dt"], kind="stable")
+    _write_parquet(df, uri)
+
+
+def _get_data_version(base_uri=CLEAN_URI, **params):
+    """
+    Version cached reads by the latest day loaded, so a new day isn't
+    hidden behind a cached response until it expires.
+    """
+    return get_most_recent_date(base_uri=base_uri)
+
+
+@cache.cacheable(ttl=CACHE_TTL, version=_get_data_version)
+def fetch_data(
+    date=None,
+    base_uri=CLEAN_URI,
+    file_type=".csv",
+    columns=None,
+    consolidated_uri=CONSOLIDATED_URI,
+    max_workers=READ_WORKERS,
+    country=None,
+    format="dict",
+    since=None,
+):
     """
     Get all of the coronavirus data that's been uploaded.
 
     :param str date: String of the date ('%m-%d-%Y').
     :param str base_uri: The base uri to build the path on.
     :param str file_type: CSV. Should probably never change.
+    :param list columns: Only read these columns (list or comma-separated).
+    :param str consolidated_uri: Where the consolidated dataset lives.
+    :param int max_workers: How many files to read at once.
+    :param list country: Only read these regions.
+    :param str format: Response format: dict, columns, records, split or
+                       arrow (see `frames.to_format`).
+    :param str since: Only return days after this one ('%m-%d-%Y'), so
+                      clients can fetch just what's new.
     """
-    if not date:
-        keys = blob.list_files(base_uri)
+    df = _read_data(
+        date=date,
+        base_uri=base_uri,
+        file_type=file_type,
+        columns=columns,
+        consolidated_uri=consolidated_uri,
+        max_workers=max_workers,
+        country=country,
+        since=since,
+    )
+    return frames.to_format(df, format=format)
+
+
+def _read_data(
+    date=None,
+    base_uri=CLEAN_URI,
+    file_type=".csv",
+    columns=None,
+    consolidated_uri=CONSOLIDATED_URI,
+    max_workers=READ_WORKERS,
+    country=None,
+    since=None,
+):
+    """
+    Read the data into a DataFrame, from the consolidated dataset if it
+    exists, otherwise from the daily clean CSVs. Country and `since`
+    filters are pushed down: months before `since` aren't read at all, and
+    the Parquet reader only reads the matching row groups.
+    """
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    country = _parse_country(country)
+
+    month_uris = _get_month_uris(
+        date=date, consolidated_uri=consolidated_uri, since=since
+    )
+    if month_uris:
+        logging.info("Reading in consolidated Coronavirus data...")
+        filters = []
+        if date:
+            dt = datetime.strptime(date, "%m-%d-%Y").strftime("%Y-%m-%d")
+            filters.append(("dt", "==", dt))
+        if since:
+            dt = datetime.strptime(since, "%m-%d-%Y").strftime("%Y-%m-%d")
+            filters.append(("dt", ">", dt))
+        if country:
+            filters.append(("region", "in", country))
+        dfs = frames.read_many(
+            month_uris,
+            reader=_read_parquet_compact,
+            max_workers=max_workers,
+            columns=columns,
+            filters=filters or None,
+        )
     else:
-        keys = [os.path.join("corona/clean", date + file_type)]  # TODO: fix
-    dfs = []
-    logging.info("Reading in Coronavirus data...")
-    for key in tqdm(keys):
-        path = os.path.join(base_uri, os.path.basename(key))
-        dfs.append(pd.read_csv(path))
-    df = pd.concat(dfs)
-    df.reset_index(drop=True, inplace=True)
-    return df.to_dict()
+        keys = _get_clean_keys(
+            date=date, base_uri=base_uri, file_type=file_type
+        )
+        if since:
+            since_date = datetime.strptime(since, "%m-%d-%Y")
+            keys = [k for k in keys if _get_key_date(k) > since_date]
+        paths = [os.path.join(base_uri, os.path.basename(k)) for k in keys]
+        logging.info(f"Reading in {len(paths)} Coronavirus files...")
+        dfs = frames.read_many(paths, max_workers=max_workers, usecols=columns)
+        if country:
+            dfs = [df[df["region"].isin(country)] for df in dfs]
+        dfs = [set_types(df) for df in dfs]
 
+    # Each file is typed as it's read, so the object columns of only one
+    # file at a time are in memory.
+    return frames.concat_categoricals(dfs)
 
-def get_most_recent_date(base_uri=CLEAN_URI):
+
+def _read_parquet_compact(uri, **kwargs):
+    return set_types(pd.read_parquet(uri, **kwargs))
+
+
+def _get_month_uris(date=None, consolidated_uri=CONSOLIDATED_URI, since=None):
     """
-    Get the most recent day that data was loaded based on a URI.
+    Get the monthly consolidated files to read: all of them, the one a
+    date belongs to, or the ones that can have days after `since`. Empty
+    if the consolidated dataset hasn't been built.
     """
-    keys = blob.list_files(base_uri)
-    dt = max([os.path.splitext(os.path.basename(k))[0] for k in keys]).replace(
-        "-", "/"
+    if not consolidated_uri:
+        return []
+
+    try:
+        keys = [p["uri"] for p in manifest.get_partitions(consolidated_uri)]
+    except FileNotFoundError:
+        try:
+            keys = blob.list_files(consolidated_uri)
+        except Exception as e:
+            logging.warning(f"Couldn't list {consolidated_uri}: {e}")
+            return []
+
+    uris = sorted(
+        f"{consolidated_uri}/{os.path.basename(k)}"
+        for k in keys
+        if k.endswith(".parquet")
     )
-    return dt
+    if date:
+        month_uri = _get_month_uri(date, consolidated_uri)
+        uris = [uri for uri in uris if uri == month_uri]
+    if since:
+        month_uri = _get_month_uri(since, consolidated_uri)
+        uris = [uri for uri in uris if uri >= month_uri]
+    return uris
+
+
+@encoding.streaming
+def stream_data(
+    date=None,
+    base_uri=CLEAN_URI,
+    file_type=".csv",
+    chunksize=STREAM_CHUNKSIZE,
+):
+    """
+    Stream the coronavirus data as newline-delimited JSON. Files are read in
+    chunks and each chunk is sent as soon as it's parsed, so memory use
+    doesn't grow with the size of the history.
+
+    :param str date: String of the date ('%m-%d-%Y').
+    :param str base_uri: The base uri to build the path on.
+    :param str file_type: CSV. Should probably never change.
+    :param int chunksize: Number of rows to read and send at a time.
+    """
+    # List eagerly so a bad request fails before the response starts.
+    keys = _get_clean_keys(date=date, base_uri=base_uri, file_type=file_type)
+    paths = [os.path.join(base_uri, os.path.basename(k)) for k in keys]
+    return frames.stream_csvs(paths, chunksize=int(chunksize))
+
+
+def _get_clean_keys(date=None, base_uri=CLEAN_URI, file_type=".csv"):
+    """
+    Get the keys of the clean files to read: all of them (from the
+    manifest, or a listing if there isn't one), or just one day.
+    """
+    if not date:
+        try:
+            return [p["uri"] for p in manifest.get_partitions(base_uri)]
+        except FileNotFoundError:
+            return sorted(blob.list_files(base_uri), key=_get_key_date)
+    return [os.path.join("corona/clean", date + file_type)]  # TODO: fix
 
 
-def fetch_data_graphable(date=None, base_uri=CLEAN_URI):
+def _get_key_date(key):
+    """
+    Get the date of a daily file from its key, for sorting.
+    """
+    date_string = os.path.splitext(os.path.basename(key))[0]
+    return datetime.strptime(date_string, "%m-%d-%Y")
+
+
+@cache.cacheable(ttl=CACHE_TTL)
+def get_most_recent_date(base_uri=CLEAN_URI):
+    """
+    Get the most recent day that data was loaded based on a URI. Read from
+    the dataset's manifest, or a listing if there isn't one.
+    """
+    try:
+        dt = manifest.get_latest(base_uri)
+    except FileNotFoundError:
+        keys = blob.list_files(base_uri)
+        dt = os.path.splitext(os.path.basename(max(keys, key=_get_key_date)))[
+            0
+        ]
+    return dt.replace("-", "/")
+
+
+def fetch_data_graphable(date=None, base_uri=CLEAN_URI, country=None):
     """
     Build a dataframe of graph-friendly data.
     """
-    df = pd.DataFrame(fetch_data(date=date, base_uri=base_uri))
-    df["recovered_pcent"] = (df["recovered"] / df["confirmed"]) * 100
-    df["deaths_pcent"] = (df["deaths"] / df["confirmed"]) * 100
-    df["active"] = df["confirmed"] - (df["deaths"] + df["recovered"])
-    df["active_pcent"] = (df["active"] / df["confirmed"]) * 100
+    df = _read_data(date=date, base_uri=base_uri, country=country)
+    df = _add_derived_columns(frames.upcast_floats(df))
     df.sort_values(["dt"], ascending=True)
     return df
 
@@ -251,9 +839,13 @@ def create_map(df, country=None):
     """
     Create a graphable JSON Map object.
     """
+    return _encode_json(_map_figure(df, country=country))
+
+
+def _map_figure(df, country=None):
     if country:
         df = df[df["region"].isin(country)]
-        if True in list(pd.isna(df["state"])):
+        if "state" not in df.columns or True in list(pd.isna(df["state"])):
             hover_name = color = text = df["region"]
         else:
             hover_name = color = text = df["state"]
@@ -281,9 +873,7 @@ def create_map(df, country=None):
     )
     natearth_fig.update_geos(fitbounds="locations")
 
-    graphJSON = json.dumps(natearth_fig, cls=plotly.utils.PlotlyJSONEncoder)
-
-    return graphJSON
+    return natearth_fig
 
 
 # Table - only needs today's data
@@ -291,13 +881,23 @@ def create_table(df, nrows=10, country=None, y_axis="dt"):
     """
     Create a graphable table of statistics object.
     """
+    return _encode_json(_table_figure(df, country=country, y_axis=y_axis))
+
+
+def _table_figure(df, country=None, y_axis="dt"):
     if country:
         df = df[df["region"].isin(country)]
     else:
         df = df[df["confirmed"] > 1000]
         country = "Whole World"
 
-    df = df.groupby(["state", "region", "dt"]).sum().reset_index()
+    df = (
+        df.groupby(["state", "region", "dt"], observed=True)[
+            ["confirmed", "deaths", "recovered"]
+        ]
+        .sum()
+        .reset_index()
+    )
 
     df["recovered_pcent"] = ((df["recovered"] / df["confirmed"]) * 100).round(
         1
@@ -355,26 +955,32 @@ def create_table(df, nrows=10, country=None, y_axis="dt"):
             margin=go.layout.Margin(l=0, r=0, b=0, t=0)  # noqa:E741
         ),
     )
-    serialized = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return serialized
+    return fig
 
 
 # Time series - needs the whole dataframe
 def create_chart(df, country=None, chart_type="lines", y_axis="deaths_pcent"):
     """
+    Create a graphable JSON time series, one trace per region.
     """
+    return _encode_json(
+        _chart_figure(
+            df, country=country, chart_type=chart_type, y_axis=y_axis
+        )
+    )
+
+
+def _chart_figure(df, country=None, chart_type="lines", y_axis="deaths_pcent"):
     if country:
         df = df[df["region"].isin(country)]
     else:
         df = df[df["confirmed"] > 1000]
         country = "Whole World"
 
-    dr_data = []
-
-    for region in df.region.unique():
-        relevant = df[df["region"] == region]
-        relevant.sort_values(by="dt")
-        d = {
+    # Sort once, then split into regions in a single pass.
+    df = df.sort_values(["region", "dt"], kind="stable")
+    dr_data = [
+        {
             "x": relevant["dt"],
             "y": relevant[y_axis],
             "text": relevant[y_axis],
@@ -382,7 +988,8 @@ def create_chart(df, country=None, chart_type="lines", y_axis="deaths_pcent"):
             "marker": {"size": 15, "line": {"width": 0.5, "color": "white"}},
             "name": region,
         }
-        dr_data.append(d)
+        for region, relevant in df.groupby("region", sort=False, observed=True)
+    ]
 
     fig = go.Figure(
         data=dr_data,
@@ -394,46 +1001,230 @@ def create_chart(df, country=None, chart_type="lines", y_axis="deaths_pcent"):
         ),
     )
 
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-
-    return graphJSON
+    return fig
 
 
 # API entry point
+@cache.cacheable(ttl=CACHE_TTL, version=_get_data_version)
 def fetch_plots(
-    country=None, chart_type=None, y_axis="deaths_pcent", base_uri=CLEAN_URI
+    country=None,
+    chart_type=None,
+    y_axis="deaths_pcent",
+    base_uri=CLEAN_URI,
+    aggregate_uri=AGGREGATE_URI,
+    plots_uri=PLOTS_URI,
+    format="legacy",
 ):
     """
-    Create the plots in an entry point.
+    Create the plots in an entry point. Plots are served pre-rendered for
+    the latest date when possible, and kept in the response cache until a
+    new day is loaded. With a country filter, only those regions are read.
+
+    :param list country: Regions to plot.
+    :param str format: `legacy`, `json` or `binary` (see PLOT_FORMATS).
+                       `json` and `binary` are encoded once and sent as is.
+    """
+    if format not in PLOT_FORMATS:
+        raise ValueError(
+            f"Format {format} is invalid! Use one of {PLOT_FORMATS}."
+        )
+
+    country = _parse_country(country)
+    most_recent_date = get_most_recent_date()
+    uri = _get_plots_uri(
+        most_recent_date, country, chart_type, y_axis, plots_uri, format
+    )
+
+    try:
+        obj = blob.read_file(uri)
+        obj = obj.decode() if isinstance(obj, bytes) else obj
+        if format != "legacy":
+            obj = encoding.EncodedJSON(obj)
+    except FileNotFoundError:
+        figures = _build_figures(
+            most_recent_date,
+            country=country,
+            chart_type=chart_type,
+            y_axis=y_axis,
+            base_uri=base_uri,
+            aggregate_uri=aggregate_uri,
+        )
+        obj = _encode_plots(figures, format)
+    return obj
+
+
+def render_plots(
+    base_uri=CLEAN_URI,
+    aggregate_uri=AGGREGATE_URI,
+    plots_uri=PLOTS_URI,
+    plots=DEFAULT_PLOTS,
+):
+    """
+    Render the default plots for the latest date and save them to blob
+    storage in every format, versioned by that date.
+    """
+    most_recent_date = get_most_recent_date(base_uri=base_uri)
+    uris = []
+    for params in plots:
+        figures = _build_figures(
+            most_recent_date,
+            base_uri=base_uri,
+            aggregate_uri=aggregate_uri,
+            **params,
+        )
+        for format in PLOT_FORMATS:
+            uri = _get_plots_uri(
+                most_recent_date, plots_uri=plots_uri, format=format, **params
+            )
+            logging.info(f"Writing to {uri}...")
+            blob.write_file(uri, _encode_plots(figures, format))
+            uris.append(uri)
+    return uris
+
+
+def _get_plots_uri(
+    most_recent_date,
+    country=None,
+    chart_type=None,
+    y_axis=None,
+    plots_uri=PLOTS_URI,
+    format="legacy",
+):
+    """
+    Get the URI of a rendered set of plots. The latest date is the version,
+    the params (and format) are hashed.
+
+    :param str most_recent_date: The latest date ('%m/%d/%Y').
+    """
+    version = datetime.strptime(most_recent_date, "%m/%d/%Y").strftime(
+        "%Y-%m-%d"
+    )
+    params = json.dumps([_parse_country(country), chart_type, y_axis, format])
+    digest = hashlib.sha256(params.encode()).hexdigest()[:16]
+    return f"{plots_uri}/{version}/{digest}.json"
+
+
+def _build_figures(
+    most_recent_date,
+    country=None,
+    chart_type=None,
+    y_axis="deaths_pcent",
+    base_uri=CLEAN_URI,
+    aggregate_uri=AGGREGATE_URI,
+):
+    """
+    Build the map, chart and table figures for the latest date.
+
+    :param str most_recent_date: The latest date ('%m/%d/%Y').
+    :return dict: {"map", "chart", "table"} plotly figures.
     """
     most_recent_date = datetime.strptime(
-        get_most_recent_date(), "%m/%d/%Y"
+        most_recent_date, "%m/%d/%Y"
     ).strftime("%m-%d-%Y")
 
-    if os.environ.get("LOCAL"):
-        all_data_date = most_recent_date
-    else:
-        all_data_date = None
-
-    # Data
-    all_data = fetch_data_graphable(date=all_data_date, base_uri=base_uri)
-    all_data_grouped = (
-        all_data.groupby(["region", "dt"])
-        .sum()
-        .sort_values(["dt"], ascending=False)
-        .reset_index()
+    # Data: the small region/day aggregate, plus today's detailed rows.
+    country = _parse_country(country)
+    all_data_grouped = frames.upcast_floats(
+        _read_aggregate(
+            aggregate_uri=aggregate_uri, base_uri=base_uri, country=country
+        )
     )
     todays_data = fetch_data_graphable(
-        date=most_recent_date, base_uri=base_uri
+        date=most_recent_date, base_uri=base_uri, country=country
     )
 
     # Plots
-    map = create_map(all_data_grouped, country=country)  # needs today's
-    chart = create_chart(
-        all_data, country=country, chart_type=chart_type, y_axis=y_axis
-    )  # needs whole thing
-    stats = create_table(
-        todays_data, country=country, y_axis=y_axis
-    )  # needs today's
-    obj = json.dumps((map, chart, stats))
+    return {
+        "map": _map_figure(
+            all_data_grouped.sort_values(["dt"], ascending=False),
+            country=country,
+        ),
+        "chart": _chart_figure(
+            all_data_grouped,
+            country=country,
+            chart_type=chart_type,
+            y_axis=y_axis,
+        ),
+        "table": _table_figure(
+            todays_data, country=country, y_axis=y_axis
+        ),  # needs today's
+    }
+
+
+def _encode_plots(figures, format="legacy"):
+    """
+    Encode the figures from `_build_figures` in one of PLOT_FORMATS.
+    """
+    if format == "legacy":
+        return json.dumps([_encode_json(fig) for fig in figures.values()])
+
+    obj = {name: fig.to_plotly_json() for name, fig in figures.items()}
+    if format == "binary":
+        obj = _to_typed_arrays(obj)
+    else:
+        obj = _to_plain_arrays(obj)
+    return encoding.EncodedJSON(_encode_json(obj))
+
+
+def _encode_json(obj):
+    """
+    Encode figures (or anything in them) as JSON in one pass.
+    """
+    return encoding.dumps(
+        obj, default=_plotly_default, cls=plotly.utils.PlotlyJSONEncoder
+    )
+
+
+def _plotly_default(obj):
+    return plotly.utils.PlotlyJSONEncoder().default(obj)
+
+
+def _to_typed_arrays(obj):
+    """
+    Replace numeric NumPy arrays with plotly.js typed arrays:
+    {"dtype": "f8", "bdata": "<base64>"}.
+    """
+    if isinstance(obj, dict):
+        return {k: _to_typed_arrays(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_typed_arrays(v) for v in obj]
+    if not isinstance(obj, np.ndarray) or obj.dtype.kind not in "biuf":
+        return obj
+
+    array = obj
+    if array.ndim != 1:
+        return array
+    if array.dtype.kind == "b":
+        array = array.astype("u1")
+    elif array.dtype.str[1:] not in TYPED_ARRAY_DTYPES:
+        i4 = np.iinfo("i4")
+        fits = array.dtype.kind in "iu" and (
+            array.size == 0
+            or (array.min() >= i4.min and array.max() <= i4.max)
+        )
+        array = array.astype("i4" if fits else "f8")
+    array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+    return {
+        "dtype": array.dtype.str[1:],
+        "bdata": base64.b64encode(np.ascontiguousarray(array)).decode(),
+    }
+
+
+def _to_plain_arrays(obj):
+    """
+    Replace typed arrays (which newer versions of plotly emit on their own)
+    with plain arrays.
+    """
+    if isinstance(obj, dict):
+        if set(obj) in ({"dtype", "bdata"}, {"dtype", "bdata", "shape"}):
+            array = np.frombuffer(
+                base64.b64decode(obj["bdata"]), dtype=np.dtype(obj["dtype"])
+            )
+            if "shape" in obj:
+                shape = [int(n) for n in str(obj["shape"]).split(",")]
+                array = array.reshape(shape)
+            return array
+        return {k: _to_plain_arrays(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_plain_arrays(v) for v in obj]
     return obj
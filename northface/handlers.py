@@ -1,10 +1,25 @@
 import argparse
+import base64
+import contextlib
+import importlib
 import inspect
-import jana
 import json
 import logging
 import os
 import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from northface.utils import (
+    cache,
+    encoding,
+    jobs,
+    metrics,
+    profiling,
+    secret_cache,
+)
 
 SECRET_NAME = ""
 
@@ -27,17 +42,20 @@ def json_string_to_env(string):
 
 try:
     if CLOUD_SERVICE_PROVIDER == "gcp":
-        secret_string = jana.fetch_secret(
+        secret_string = secret_cache.get_secret(
             "gcp-secretmanager",
             SECRET_STRING_NAME,
             GCP_PROJECT_NAME,
             GCP_SECRET_VERSION,
+            on_refresh=json_string_to_env,
         )
         json_string_to_env(secret_string)
 
     elif CLOUD_SERVICE_PROVIDER == "aws":
-        secret_string = jana.fetch_secret(
-            "aws-secretsmanager", SECRET_STRING_NAME,
+        secret_string = secret_cache.get_secret(
+            "aws-secretsmanager",
+            SECRET_STRING_NAME,
+            on_refresh=json_string_to_env,
         )
         json_string_to_env(secret_string)
 
@@ -50,18 +68,6 @@ except Exception as e:
     )
 
 
-from northface import (  # noqa
-    keyme,
-    sentimenter,
-    corona,
-    pollin,
-    whatsmybill,
-    resumayday,
-    zacks_todos,
-    openaq,
-    nurse,
-)
-
 CLI_LOGO = r"""
                .        .
  __._  _ .    ,|_ *._. _|
@@ -82,27 +88,155 @@ def get_name(module):
     return module.__name__.split(".")[-1]
 
 
+# Resources are registered by name and only imported the first time they're
+# used, so a cold start doesn't pay for pandas, plotly, tweepy, etc. unless
+# the request actually needs them.
 RESOURCES = {
-    get_name(keyme): keyme,
-    get_name(sentimenter): sentimenter,
-    get_name(corona): corona,
-    get_name(resumayday): resumayday,
-    get_name(pollin): pollin,
-    get_name(whatsmybill): whatsmybill,
-    get_name(zacks_todos): zacks_todos,
-    get_name(openaq): openaq,
-    get_name(nurse): nurse,
+    "keyme": "northface.keyme",
+    "sentimenter": "northface.sentimenter",
+    "corona": "northface.corona",
+    "resumayday": "northface.resumayday",
+    "pollin": "northface.pollin",
+    "whatsmybill": "northface.whatsmybill",
+    "zacks_todos": "northface.zacks_todos",
+    "openaq": "northface.openaq",
+    "nurse": "northface.nurse",
 }
 
+ACTIONS = {}
+IMPORT_COSTS = {}
+
+# Batched queries run concurrently on a bounded pool per batch.
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+REGISTRY_LOCK = threading.RLock()
+
+
+def is_action(module, name, obj, exported_only=True):
+    """
+    Check whether a module member is an action that can be called through
+    the handlers. Only public functions defined in the module itself count,
+    so imported helpers (e.g. `datetime`, `blob`) are never exposed, and
+    only the ones listed in the module's `__all__` are exported.
+
+    :param bool exported_only: Only count the names in `__all__`. The CLI
+                               can also run the other public functions
+                               (e.g. ETL jobs).
+    """
+    if not inspect.isfunction(obj) or name.startswith("_"):
+        return False
+
+    if obj.__module__ != module.__name__:
+        return False
 
-def get_functions(module):
+    return not exported_only or name in getattr(module, "__all__", [])
+
+
+def get_functions(module, exported_only=True):
     return {
-        f[0]: f[1]
-        for f in inspect.getmembers(module)
-        if inspect.isfunction(f[1])
+        name: obj
+        for name, obj in vars(module).items()
+        if is_action(module, name, obj, exported_only=exported_only)
     }
 
 
+def load_resource(resource, resources=RESOURCES):
+    """
+    Import a resource module, recording how long the import took.
+
+    :param str resource: Name of the resource (e.g. `corona`).
+    :param dict resources: Mapping of resource name to module path.
+    :return module: The imported module.
+    """
+    if resource not in resources:
+        raise TypeError(f"Resource {resource} is invalid!")
+
+    module_path = resources[resource]
+    if module_path in sys.modules:
+        return sys.modules[module_path]
+
+    with REGISTRY_LOCK:
+        modules_before = len(sys.modules)
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        elapsed = time.perf_counter() - start
+
+        if resource not in IMPORT_COSTS:
+            IMPORT_COSTS[resource] = {
+                "seconds": round(elapsed, 6),
+                "modules_imported": len(sys.modules) - modules_before,
+            }
+            logging.info(f"Imported {module_path} in {elapsed:.3f}s")
+
+    return module
+
+
+def get_actions(resource):
+    """
+    Get the dispatch table for a resource, importing it on first use.
+
+    :param str resource: Name of the resource (e.g. `corona`).
+    :return dict: {action: (callable, inspect.Signature)}
+    """
+    if resource in ACTIONS:
+        return ACTIONS[resource]
+
+    with REGISTRY_LOCK:
+        if resource not in ACTIONS:
+            module = load_resource(resource)
+            ACTIONS[resource] = {
+                name: (function, inspect.signature(function))
+                for name, function in get_functions(module).items()
+            }
+
+    return ACTIONS[resource]
+
+
+def get_import_costs():
+    """
+    Report the import cost of every resource loaded so far.
+
+    :return dict: {resource: {"seconds": float, "modules_imported": int}}
+    """
+    return {
+        resource: IMPORT_COSTS.get(resource)
+        for resource in RESOURCES.keys()
+        if resource in IMPORT_COSTS
+    }
+
+
+def get_metrics():
+    """
+    Render request metrics from every worker in Prometheus text format.
+    """
+    return metrics.to_prometheus(metrics.collect())
+
+
+def get_cache_stats():
+    """
+    Report response cache hits and misses for this process.
+    """
+    return cache.get_stats()
+
+
+def validate_params(action, signature, params):
+    """
+    Check that a set of params can be passed to an action.
+
+    :param str action: Name of the action (for error messages).
+    :param inspect.Signature signature: Signature of the action.
+    :param dict params: Keyword arguments for the action.
+    :raises TypeError: If the params don't match the signature.
+    """
+    try:
+        signature.bind(**params)
+    except TypeError as e:
+        raise TypeError(
+            f"Params are invalid for action {action}! {e}. "
+            f"Expected: {action}{signature}"
+        )
+
+
 def fetch_actions(module):
     """
     Examine a module, and create an argparser from all of its callable
@@ -116,17 +250,18 @@ def fetch_actions(module):
         description=CLI_LOGO + module_doc,
         formatter_class=argparse.RawTextHelpFormatter,
     )
-    functions = get_functions(module)
+    functions = get_functions(module, exported_only=False)
     parser.add_argument("action", choices=functions.keys())
     args = parser.parse_args(sys.argv[2:3])
 
     function = functions[args.action]
+    signature = inspect.signature(function)
     function_doc = function.__doc__ or function.__name__
     subparser = argparse.ArgumentParser(
         description=CLI_LOGO + function_doc,
         formatter_class=argparse.RawTextHelpFormatter,
     )
-    params = inspect.signature(function).parameters
+    params = signature.parameters
 
     for param_name, param in params.items():
         if param.default is not inspect._empty:
@@ -156,15 +291,27 @@ def cli_handler():
         "resource", help="Command to run", choices=RESOURCES.keys()
     )
     args = command_parser.parse_args(sys.argv[1:2])
-    action, params = fetch_actions(RESOURCES[args.resource])
+    action, params = fetch_actions(load_resource(args.resource))
     response = handle(action, params)
-    if response is not None:
+    if inspect.isgenerator(response):
+        for chunk in response:
+            sys.stdout.write(chunk)
+    elif response is not None:
         print(response)
 
 
-def dict_handler(d):
+def dict_handler(d, context=None, stream=False):
     """
-    Parse arguments from a dictionary.
+    Parse arguments from a dictionary. If `async` is set, the action is
+    queued as a background job and its status (with a `job_id` to poll) is
+    returned immediately.
+
+    :param dict d: {resource, action, params, async}
+    :param callable context: Returns a context manager to run background
+                             jobs in (e.g. a Flask app context).
+    :param bool stream: Whether the caller sends generator results as a
+                        streamed body. Streaming actions are rejected
+                        otherwise, and when `async` is set.
     """
     resource = d.get("resource")
     action = d.get("action")
@@ -176,29 +323,170 @@ def dict_handler(d):
     if resource not in RESOURCES.keys():
         raise TypeError(f"Resource {resource} is invalid!")
 
-    actions = get_functions(RESOURCES[resource])
+    actions = get_actions(resource)
 
     if action not in actions.keys():
         raise TypeError(f"Action {action} is invalid!")
 
-    action = actions[action]
-
     if not isinstance(params, dict):
         raise TypeError("Params are invalid! Must be a dict.")
 
-    response = handle(action, params)
+    function, signature = actions[action]
+    validate_params(action, signature, params)
+
+    if encoding.is_streaming(function) and (d.get("async") or not stream):
+        raise TypeError(
+            f"Action {action} streams its results! Use the "
+            f"/{resource}/stream endpoint instead."
+        )
+
+    if d.get("async"):
+        return jobs.submit(
+            f"{resource}/{action}",
+            execute,
+            {"resource": resource, "action": action, "params": params},
+            context=context,
+        )
+
+    response = execute(resource, action, params)
 
     return response
 
 
+def execute(resource, action, params):
+    """
+    Run a validated action, recording its latency and serving it from the
+    response cache if the action is cacheable.
+    """
+    function, signature = get_actions(resource)[action]
+    if encoding.is_streaming(function):
+        return execute_stream(resource, action, function, params)
+
+    with metrics.timed(resource, action), profiling.profiled():
+        ttl = getattr(function, "cache_ttl", None)
+        if ttl:
+            bound = signature.bind(**params)
+            bound.apply_defaults()
+            key = cache.make_key(
+                resource,
+                action,
+                bound.arguments,
+                cache.get_version(function, bound.arguments),
+            )
+            return cache.cached_call(key, ttl, handle, function, params)
+
+        return handle(function, params)
+
+
+def execute_stream(resource, action, function, params):
+    """
+    Start a streaming action. It's called right away, so bad params or
+    missing data fail before the response starts, but its latency and
+    profile are recorded as its chunks are produced.
+    """
+    start = time.perf_counter()
+    try:
+        chunks = handle(function, params)
+    except Exception:
+        metrics.record(
+            resource, action, time.perf_counter() - start, error=True
+        )
+        raise
+    return metrics.timed_chunks(
+        resource, action, profiling.profiled_chunks(chunks), start=start
+    )
+
+
+def batch_handler(
+    queries,
+    max_workers=BATCH_MAX_WORKERS,
+    max_queries=BATCH_MAX_QUERIES,
+    context=None,
+):
+    """
+    Run a list of independent queries concurrently on a bounded worker pool.
+    A failing query doesn't fail the batch; its error is reported in place.
+
+    :param list queries: List of {resource, action, params} dicts.
+    :param int max_workers: Maximum number of queries to run at once.
+    :param int max_queries: Maximum number of queries in one batch.
+    :param callable context: Returns a context manager to run each query in
+                             (e.g. a Flask app context). Async queries are
+                             queued as jobs that run in it too.
+    :return list: [{"result": ..., "error": ...}] in the order of queries.
+    """
+    if not isinstance(queries, list):
+        raise TypeError("Queries are invalid! Must be a list.")
+
+    if len(queries) > max_queries:
+        raise TypeError(
+            f"Too many queries! Received {len(queries)}, max is {max_queries}."
+        )
+
+    if not queries:
+        return []
+
+    def run(query):
+        try:
+            if not isinstance(query, dict):
+                raise TypeError("Query is invalid! Must be a dict.")
+            with context() if context else contextlib.nullcontext():
+                result = encoding.embeddable(
+                    dict_handler(query, context=context)
+                )
+                return {"result": result, "error": None}
+        except Exception as e:
+            return {"result": None, "error": str(e)}
+
+    workers = min(max_workers, len(queries))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, queries))
+
+
 def lambda_handler(event, context):
     """Parse the event and pass it to the application.
     """
     request = json.loads(event["body"])
-    result = dict_handler(request)
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    profiling.disable()
+    if profiling.authorize(headers.get(profiling.PROFILE_HEADER.lower())):
+        profiling.enable(
+            memory=bool(headers.get(profiling.PROFILE_MEMORY_HEADER.lower()))
+        )
+
+    # Lambda freezes the process once it responds, so background jobs
+    # can't run there. Always run actions inline.
+    for query in request if isinstance(request, list) else [request]:
+        if isinstance(query, dict):
+            query.pop("async", None)
+
+    if isinstance(request, list):
+        result = batch_handler(request)
+    else:
+        result = dict_handler(request, stream=True)
     response = {}
-    response["body"] = json.dumps(result)
     response["headers"] = {"Access-Control-Allow-Origin": "*"}
+    if inspect.isgenerator(result):
+        # Lambda can't stream, so streamed actions are sent in one piece.
+        response["body"] = "".join(result)
+        response["headers"]["Content-Type"] = encoding.NDJSON_MIMETYPE
+    elif encoding.raw_body(result):
+        body, mimetype = encoding.raw_body(result)
+        response["headers"]["Content-Type"] = mimetype
+        if isinstance(body, bytes):
+            response["body"] = base64.b64encode(body).decode()
+            response["isBase64Encoded"] = True
+        else:
+            response["body"] = body
+    else:
+        response["body"] = json.dumps(result)
+
+    report = profiling.disable()
+    if report:
+        response["headers"].update(profiling.report_headers(report))
+
+    # CloudWatch picks this up from stdout; one line per invocation.
+    print(json.dumps({"metrics": metrics.summary(metrics.METRICS)}))
     return response
 
 
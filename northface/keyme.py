@@ -1,5 +1,7 @@
 from rake_nltk import Rake
 
+__all__ = ["get_keywords"]
+
 
 def get_keywords(text, topn=10):
     """
@@ -4,6 +4,8 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from app import db
 
+__all__ = ["get", "add", "delete"]
+
 
 class HealthCheck(db.Model):
     id = db.Column(db.Integer, primary_key=True)
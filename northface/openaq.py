@@ -5,6 +5,8 @@ import pandas as pd
 
 from northface.utils import blob
 
+__all__ = ["extract", "transform"]
+
 COUNTRY = "US"
 
 # Destination is driven by environmnet variables.
@@ -18,6 +20,13 @@ elif provider == "aws":
     EXTRACT_URI = "s3://snowbird-assets/openaq/raw"
     TRANSFORM_URI = "s3://snowbird-assets/openaq/clean"
 
+elif provider == "local":
+    LOCAL_DATA_URI = os.environ.get("LOCAL_DATA_URI", "/tmp/snowbird-data")
+    EXTRACT_URI = f"{LOCAL_DATA_URI}/openaq/raw"
+    TRANSFORM_URI = f"{LOCAL_DATA_URI}/openaq/clean"
+    for uri in [EXTRACT_URI, TRANSFORM_URI]:
+        os.makedirs(uri, exist_ok=True)
+
 OPENAQ_API = "https://api.openaq.org/v1/measurements"
 
 
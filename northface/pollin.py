@@ -2,10 +2,18 @@
 Presidential polling data analysis.
 """
 
+import logging
 import os
+import threading
+import numpy as np
 import pandas as pd
 
-from northface.utils import blob
+from datetime import datetime
+
+from northface.utils import blob, cache, encoding, frames, manifest
+
+# extract and transform write to storage, so they're only run by the CLI.
+__all__ = ["fetch_data", "stream_data", "query_polls", "get_most_recent_date"]
 
 
 # Destination is driven by environmnet variables.
@@ -14,14 +22,62 @@ provider = os.environ.get("CLOUD_SERVICE_PROVIDER", "aws")
 if provider == "gcp":
     EXTRACT_URI = "gs://snowbird-data/pollin/raw"
     CLEAN_URI = "gs://snowbird-data/pollin/clean"
+    DELTA_URI = "gs://snowbird-data/pollin/deltas"
+    STATE_URI = "gs://snowbird-data/pollin/state.csv"
 
 elif provider == "aws":
     EXTRACT_URI = "s3://snowbird-assets/pollin/raw"
     CLEAN_URI = "s3://snowbird-assets/pollin/clean"
+    DELTA_URI = "s3://snowbird-assets/pollin/deltas"
+    STATE_URI = "s3://snowbird-assets/pollin/state.csv"
+
+elif provider == "local":
+    LOCAL_DATA_URI = os.environ.get("LOCAL_DATA_URI", "/tmp/snowbird-data")
+    EXTRACT_URI = f"{LOCAL_DATA_URI}/pollin/raw"
+    CLEAN_URI = f"{LOCAL_DATA_URI}/pollin/clean"
+    DELTA_URI = f"{LOCAL_DATA_URI}/pollin/deltas"
+    STATE_URI = f"{LOCAL_DATA_URI}/pollin/state.csv"
+    for uri in [EXTRACT_URI, CLEAN_URI, DELTA_URI]:
+        os.makedirs(uri, exist_ok=True)
+
 
+# New data lands once a day, so reads can be cached for a while.
+CACHE_TTL = int(os.environ.get("POLLIN_CACHE_TTL", "3600"))
+
+# Rows per chunk when streaming data as newline-delimited JSON.
+STREAM_CHUNKSIZE = int(os.environ.get("STREAM_CHUNKSIZE", "5000"))
 
 URL = "https://projects.fivethirtyeight.com/polls-page/president_polls.csv"
 
+DATE_FORMAT = "%m-%d-%Y"
+
+# Each day's data is diffed against the previous day's by these columns
+# (the ones the data has): a row is one candidate's result in one question.
+KEY_COLUMNS = ["question_id", "candidate_id"]
+HASH_COLUMN = "_hash"
+DELETED_COLUMN = "_deleted"
+
+# Deltas are compacted into a full snapshot once there are this many since
+# the last one, or when a day changes more than this share of the rows.
+COMPACT_EVERY = int(os.environ.get("POLLIN_COMPACT_EVERY", "7"))
+COMPACT_RATIO = float(os.environ.get("POLLIN_COMPACT_RATIO", "0.5"))
+
+# `query_polls` filters: {param: column}, matched case-insensitively. Date
+# ranges apply to the first of DATE_COLUMNS the data has.
+QUERY_COLUMNS = {
+    "candidate": "candidate_name",
+    "state": "state",
+    "pollster": "pollster",
+    "population": "population",
+}
+DATE_COLUMNS = ["end_date", "created_at"]
+MAX_PAGE_SIZE = int(os.environ.get("POLLIN_MAX_PAGE_SIZE", "1000"))
+
+# The latest parsed snapshot per clean URI, kept for as long as its object
+# is unchanged: {base_uri: {"uri", "etag", "df"}}
+SNAPSHOTS = {}
+SNAPSHOT_LOCK = threading.Lock()
+
 
 def extract(date_string, base_uri=EXTRACT_URI, url=URL, file_type=".csv"):
     """
@@ -37,39 +93,477 @@ def transform(
     in_uri_base=EXTRACT_URI,
     out_uri_base=CLEAN_URI,
     file_type=".csv",
+    delta_uri_base=DELTA_URI,
+    state_uri=STATE_URI,
 ):
     """
-    Add a `dt` column to the data and save it back to cloud storage.
+    Add a `dt` column to the data and save what changed since the previous
+    day to cloud storage as a delta: the rows that were added or changed,
+    and the keys of the rows that were removed. Every COMPACT_EVERY days
+    (or when most rows changed) the full data is saved as a new snapshot
+    instead. Either is recorded in the dataset's manifest.
+
+    Rows are compared by KEY_COLUMNS and a hash of their values, kept in a
+    state file next to the tables with each row's `dt`: the day it last
+    changed, which compacted snapshots keep too.
+
+    :return str: URI of the snapshot or delta that was written.
     """
     in_uri = os.path.join(in_uri_base, date_string + file_type)
+    # Read as text, so a row hashes the same whatever types get inferred.
+    df = pd.read_csv(in_uri, dtype=str, keep_default_na=False)
+    keys = _get_key_columns(df)
+    hashes = pd.util.hash_pandas_object(df, index=False).astype(str)
+    state = df[keys].assign(**{HASH_COLUMN: hashes, "dt": date_string})
 
-    df = pd.read_csv(in_uri)
-    df["dt"] = date_string
-    df["created_at"] = pd.to_datetime(df["created_at"])
-    df["created_at"] = df["created_at"].dt.strftime("%m-%d-%Y")
+    try:
+        base, deltas = _get_partitions(out_uri_base, delta_uri_base)
+    except (FileNotFoundError, ValueError):
+        base, deltas = None, []
+    latest = deltas[-1] if deltas else base
+
+    if latest and _sort_key(date_string) <= manifest.sort_key(latest):
+        # Reloading an older day: it can't be a delta of the latest one.
+        return _write_partition(
+            _clean(df, date_string), date_string, out_uri_base, file_type
+        )
+
+    changed, removed, dates = _diff(state, keys, state_uri)
+    if dates is not None:
+        state["dt"] = dates
+    compact = (
+        base is None
+        or changed is None
+        or len(deltas) >= COMPACT_EVERY
+        or changed.sum() + len(removed) > COMPACT_RATIO * len(df)
+    )
+    if compact:
+        out_uri = _write_partition(
+            _clean(df, state["dt"].to_numpy()),
+            date_string,
+            out_uri_base,
+            file_type,
+        )
+    else:
+        delta = pd.concat(
+            [
+                _clean(df[changed], date_string).assign(
+                    **{DELETED_COLUMN: False}
+                ),
+                removed.assign(**{DELETED_COLUMN: True}),
+            ]
+        )
+        out_uri = _write_partition(
+            delta, date_string, delta_uri_base, file_type
+        )
+        logging.info(
+            f"Wrote {changed.sum()} changed and {len(removed)} removed rows "
+            f"to {out_uri}."
+        )
 
-    out_uri = os.path.join(out_uri_base, date_string + file_type)
-    df.to_csv(out_uri)
+    blob.write_file(state_uri, state.to_csv(index=False))
     return out_uri
 
 
-def fetch_data(base_uri=CLEAN_URI):
+@cache.cacheable(ttl=CACHE_TTL)
+def fetch_data(base_uri=CLEAN_URI, format="dict"):
     """
     Grab most recent data from cloud storage.
+
+    :param str format: Response format: dict, columns, records, split or
+                       arrow (see `frames.to_format`).
+    """
+    return frames.to_format(_load_snapshot(base_uri), format=format)
+
+
+@encoding.streaming
+def stream_data(
+    base_uri=CLEAN_URI, chunksize=STREAM_CHUNKSIZE, delta_uri=DELTA_URI
+):
+    """
+    Stream the most recent data as newline-delimited JSON, one chunk of rows
+    at a time. The latest snapshot is read chunk by chunk, so memory use
+    only grows with the deltas written since, which are read up front.
+    """
+    # Resolve eagerly so a bad request fails before the response starts.
+    base, deltas = _get_partitions(base_uri, delta_uri)
+    blob.head_file(base["uri"])
+    changes = _read_deltas(deltas)
+    return _stream_snapshot(base["uri"], changes, chunksize=int(chunksize))
+
+
+def query_polls(
+    candidate=None,
+    state=None,
+    pollster=None,
+    population=None,
+    start_date=None,
+    end_date=None,
+    page=1,
+    page_size=100,
+    base_uri=CLEAN_URI,
+):
+    """
+    Find polls in the most recent data, newest first. Lookups go through
+    an index of the filtered columns that's built once per snapshot.
+
+    :param str candidate: Candidate name (e.g. `Joseph R. Biden Jr.`).
+    :param str state: State name (e.g. `Pennsylvania`).
+    :param str pollster: Pollster name.
+    :param str population: Population polled (e.g. `lv`, `rv`).
+    :param str start_date: Only include polls that ended on or after this
+                           day (any format pandas can parse).
+    :param str end_date: Only include polls that ended on or before this
+                         day.
+    :param int page: Page of results, starting at 1.
+    :param int page_size: Polls per page, up to MAX_PAGE_SIZE.
+    :return EncodedJSON: {total, page, page_size, polls: [record, ...]}
     """
-    keys = blob.list_files(base_uri)
-    dt = max([os.path.splitext(os.path.basename(k))[0] for k in keys])
-    clean_data_path = f"{base_uri}/{dt}.csv"
-    df = pd.read_csv(clean_data_path)
-    return df.to_dict()
+    page, page_size = int(page), int(page_size)
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(
+            f"Page must be at least 1 and page size 1 to {MAX_PAGE_SIZE}!"
+        )
+
+    index = _get_query_index(base_uri)
+    filters = {
+        "candidate": candidate,
+        "state": state,
+        "pollster": pollster,
+        "population": population,
+    }
+    positions = None
+    for param, value in filters.items():
+        if value is None:
+            continue
+        matches = index["values"][param].get(
+            str(value).lower(), np.array([], dtype=np.intp)
+        )
+        positions = (
+            matches
+            if positions is None
+            else np.intersect1d(positions, matches, assume_unique=True)
+        )
+
+    # Rows are sorted by date, so a date range is a slice.
+    dates = index["dates"]
+    start = 0
+    stop = np.count_nonzero(~np.isnat(dates))
+    if start_date is not None:
+        start = np.searchsorted(
+            dates[:stop], np.datetime64(pd.Timestamp(start_date)), "left"
+        )
+    if end_date is not None:
+        stop = np.searchsorted(
+            dates[:stop], np.datetime64(pd.Timestamp(end_date)), "right"
+        )
+    if positions is None:
+        positions = np.arange(start, stop)
+    else:
+        positions = positions[(positions >= start) & (positions < stop)]
+
+    # Newest first.
+    first = (page - 1) * page_size
+    last = first + page_size
+    selected = positions[::-1][first:last]
+    polls = frames.to_format(index["df"].iloc[selected], format="records")
+    return encoding.EncodedJSON(
+        f'{{"total": {len(positions)}, "page": {page}, '
+        f'"page_size": {page_size}, "polls": {polls}}}'
+    )
 
 
-def get_most_recent_date(base_uri=CLEAN_URI):
+@cache.cacheable(ttl=CACHE_TTL)
+def get_most_recent_date(base_uri=CLEAN_URI, delta_uri=DELTA_URI):
     """
     Get the most recent day that data was loaded based on a URI.
     """
-    keys = blob.list_files(base_uri)
-    dt = max([os.path.splitext(os.path.basename(k))[0] for k in keys]).replace(
-        "-", "/"
+    base, deltas = _get_partitions(base_uri, delta_uri)
+    return (deltas[-1] if deltas else base)["name"].replace("-", "/")
+
+
+def _load_snapshot(base_uri=CLEAN_URI, delta_uri=DELTA_URI):
+    """
+    Get the latest data as a DataFrame: the latest full snapshot with the
+    deltas since applied. The frame is kept in memory, keyed by the
+    snapshot's ETag/generation (from a HEAD) and the deltas in the
+    manifest; new deltas are applied to it, and the snapshot is only read
+    again once a newer one exists. Callers must not modify the frame.
+    """
+    base, deltas = _get_partitions(base_uri, delta_uri)
+    etag = blob.head_file(base["uri"])["etag"]
+    applied = [(delta["uri"], delta["sha256"]) for delta in deltas]
+    with SNAPSHOT_LOCK:
+        cached = SNAPSHOTS.get(base_uri)
+    count = len(cached["deltas"]) if cached else 0
+
+    if (
+        cached
+        and cached["uri"] == base["uri"]
+        and cached["etag"] == etag
+        and cached["deltas"] == applied[:count]
+    ):
+        if cached["deltas"] == applied:
+            return cached["df"]
+        df = cached["df"]
+        new = deltas[count:]
+    else:
+        logging.info(f"Reading snapshot {base['uri']} ({etag})...")
+        df = pd.read_csv(base["uri"])
+        new = deltas
+
+    if new:
+        logging.info(f"Applying {len(new)} deltas...")
+        df = _apply_deltas(
+            df, frames.read_many([delta["uri"] for delta in new])
+        )
+    with SNAPSHOT_LOCK:
+        SNAPSHOTS[base_uri] = {
+            "uri": base["uri"],
+            "etag": etag,
+            "deltas": applied,
+            "df": df,
+        }
+    return df
+
+
+def _get_query_index(base_uri=CLEAN_URI, delta_uri=DELTA_URI):
+    """
+    Get the index `query_polls` uses for the latest snapshot, building it
+    if the snapshot changed since it was built.
+    """
+    df = _load_snapshot(base_uri, delta_uri)
+    with SNAPSHOT_LOCK:
+        index = SNAPSHOTS.get(base_uri, {}).get("index")
+    if index is not None and index["source"] is df:
+        return index
+
+    index = _build_query_index(df)
+    with SNAPSHOT_LOCK:
+        cached = SNAPSHOTS.get(base_uri)
+        if cached is not None and cached["df"] is df:
+            cached["index"] = index
+    return index
+
+
+def _build_query_index(df):
+    """
+    Index a snapshot for `query_polls`: its rows sorted by date (undated
+    rows last), and the sorted positions of the rows with each value of
+    the QUERY_COLUMNS.
+    """
+    column = next((c for c in DATE_COLUMNS if c in df.columns), None)
+    if column is None:
+        raise ValueError(f"The data doesn't have any of {DATE_COLUMNS}!")
+    dates = pd.to_datetime(df[column], errors="coerce", format="mixed")
+    order = np.argsort(dates.to_numpy(), kind="stable")
+
+    sorted_df = df.iloc[order].reset_index(drop=True)
+    values = {}
+    for param, column in QUERY_COLUMNS.items():
+        if column not in sorted_df.columns:
+            values[param] = {}
+            continue
+        keys = sorted_df[column].astype("string").str.lower()
+        values[param] = keys.groupby(keys, sort=False).indices
+    return {
+        "source": df,
+        "df": sorted_df,
+        "dates": dates.to_numpy()[order],
+        "values": values,
+    }
+
+
+def _apply_deltas(df, deltas):
+    """
+    Apply deltas to a snapshot, oldest first: a row replaces the previous
+    one with the same keys, or removes it if it's marked as deleted.
+    """
+    dtypes = df.dtypes
+    df = pd.concat([df] + list(deltas), ignore_index=True)
+    df = df.drop_duplicates(_get_key_columns(df), keep="last")
+    if DELETED_COLUMN in df.columns:
+        df = df[~df[DELETED_COLUMN].eq(True)].drop(columns=DELETED_COLUMN)
+    return _restore_dtypes(df, dtypes).reset_index(drop=True)
+
+
+def _read_deltas(deltas):
+    """
+    Read deltas into one frame with the latest change per key, including
+    removals (None if there are no deltas).
+    """
+    if not deltas:
+        return None
+    df = pd.concat(
+        frames.read_many([delta["uri"] for delta in deltas]),
+        ignore_index=True,
+    )
+    return df.drop_duplicates(_get_key_columns(df), keep="last")
+
+
+def _stream_snapshot(uri, changes=None, chunksize=STREAM_CHUNKSIZE):
+    """
+    Stream a snapshot as NDJSON with the changes from `_read_deltas`
+    applied: rows that changed or were removed are skipped as the snapshot
+    is read, and the current version of the changed rows is sent last,
+    like `_apply_deltas` orders them.
+    """
+    if changes is not None:
+        keys = _get_key_columns(changes)
+        changed_keys = pd.MultiIndex.from_frame(changes[keys])
+
+    dtypes = None
+    for chunk in pd.read_csv(uri, chunksize=chunksize):
+        dtypes = chunk.dtypes if dtypes is None else dtypes
+        if changes is not None:
+            skip = pd.MultiIndex.from_frame(chunk[keys]).isin(changed_keys)
+            chunk = chunk[~skip]
+        yield frames.to_ndjson(chunk)
+
+    if changes is None:
+        return
+    live = changes[~changes[DELETED_COLUMN].eq(True)]
+    live = live.drop(columns=DELETED_COLUMN)
+    if dtypes is not None:
+        live = _restore_dtypes(live, dtypes)
+    for start in range(0, len(live), chunksize):
+        end = start + chunksize
+        yield frames.to_ndjson(live.iloc[start:end])
+
+
+def _restore_dtypes(df, dtypes):
+    """
+    Cast columns back to the snapshot's types where they have no nulls.
+    Removed rows in deltas only have keys, which turns e.g. integers into
+    floats.
+    """
+    for column, dtype in dtypes.items():
+        if (
+            column in df.columns
+            and df[column].dtype != dtype
+            and df[column].notna().all()
+        ):
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def _clean(df, dt):
+    """
+    Add the `dt` column (one day, or one per row) and normalize dates.
+    """
+    df = df.copy()
+    df["dt"] = dt
+    df["created_at"] = pd.to_datetime(df["created_at"])
+    df["created_at"] = df["created_at"].dt.strftime("%m-%d-%Y")
+    return df
+
+
+def _diff(state, keys, state_uri=STATE_URI):
+    """
+    Compare the rows of a day with the previous day's, from the state file.
+
+    :return tuple: (Boolean mask of the rows that were added or changed, the
+                   keys of the rows that were removed, each row's `dt`: the
+                   day's for changed rows, the previous one otherwise), or
+                   (None, None, None) if there's no comparable state.
+    """
+    try:
+        previous = pd.read_csv(state_uri, dtype=str, keep_default_na=False)
+    except FileNotFoundError:
+        return None, None, None
+    if list(previous.columns) != list(state.columns):
+        return None, None, None
+    if state.duplicated(keys).any():
+        logging.warning(f"Rows aren't unique by {keys}, can't diff them!")
+        return None, None, None
+
+    current = state.set_index(keys)
+    previous = previous.set_index(keys)
+    removed = previous.index.difference(current.index).to_frame(index=False)
+    previous = previous.reindex(current.index)
+    changed = current[HASH_COLUMN].ne(previous[HASH_COLUMN]).to_numpy()
+    dates = np.where(changed, current["dt"], previous["dt"])
+    return changed, removed, dates
+
+
+def _write_partition(df, date_string, uri_base, file_type=".csv"):
+    """
+    Save a snapshot or delta and record it in the dataset's manifest.
+    """
+    out_uri = os.path.join(uri_base, date_string + file_type)
+    data = df.to_csv()
+    blob.write_file(out_uri, data)
+
+    manifest.add_partitions(
+        uri_base,
+        [
+            manifest.describe(
+                date_string,
+                out_uri,
+                data,
+                rows=len(df),
+                date=_parse_date(date_string),
+            )
+        ],
+        date_format=DATE_FORMAT,
     )
-    return dt
+    return out_uri
+
+
+def _parse_date(date_string):
+    try:
+        return datetime.strptime(date_string, DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def _sort_key(date_string):
+    """
+    Order a day like its partition in the manifest (see `manifest.sort_key`).
+    """
+    date = _parse_date(date_string)
+    return (date.strftime("%Y-%m-%d") if date else "", date_string)
+
+
+def _get_key_columns(df):
+    keys = [column for column in KEY_COLUMNS if column in df.columns]
+    if not keys:
+        raise ValueError(f"The data doesn't have any of {KEY_COLUMNS}!")
+    return keys
+
+
+def _get_partitions(base_uri=CLEAN_URI, delta_uri=DELTA_URI):
+    """
+    Get the latest full snapshot and the deltas written since, oldest first.
+    Snapshots that predate the manifest are found from a listing.
+
+    :return tuple: (snapshot, [delta, ...]) as manifest partitions.
+    """
+    try:
+        base = manifest.get_partitions(base_uri)[-1]
+    except (FileNotFoundError, IndexError):
+        name = _get_latest(base_uri)
+        return {"name": name, "uri": f"{base_uri}/{name}.csv"}, []
+
+    try:
+        deltas = manifest.get_partitions(delta_uri)
+    except FileNotFoundError:
+        deltas = []
+    deltas = [
+        delta
+        for delta in deltas
+        if manifest.sort_key(delta) > manifest.sort_key(base)
+    ]
+    return base, deltas
+
+
+def _get_latest(base_uri=CLEAN_URI):
+    """
+    Get the name of the latest clean file, from the dataset's manifest, or a
+    listing if there isn't one.
+    """
+    try:
+        return manifest.get_latest(base_uri)
+    except FileNotFoundError:
+        keys = blob.list_files(base_uri)
+        return max([os.path.splitext(os.path.basename(k))[0] for k in keys])
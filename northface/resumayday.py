@@ -12,6 +12,8 @@ from tqdm import tqdm
 
 from northface import keyme
 
+__all__ = ["fetch_jobs", "fetch_keywords", "fetch_jobs_w_keywords"]
+
 
 def get_titles(soup):
     """
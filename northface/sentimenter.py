@@ -5,6 +5,8 @@ import tweepy
 import urllib3
 import textblob
 
+__all__ = ["get_sentiment", "get_tweets"]
+
 
 TWITTER_API_KEY = os.environ.get("TWITTER_API_KEY")
 TWITTER_API_SECRET_KEY = os.environ.get("TWITTER_API_SECRET_KEY")
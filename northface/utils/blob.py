@@ -3,15 +3,28 @@ Utilities for interacting with cloud blob storage. Allows for URI-based
 handling of files across cloud providers.
 """
 
-from northface.utils import gcs, s3
+import importlib
 
 
+# Backends are imported on first use so that only the SDK for the cloud
+# that's actually being used (boto3 or google-cloud-storage) gets loaded.
 MODULE_MAPPING = {
-    "gs": gcs,
-    "s3": s3,
+    "gs": "northface.utils.gcs",
+    "s3": "northface.utils.s3",
+    "file": "northface.utils.local",
 }
 
 
+def get_scheme(uri):
+    """
+    Get the scheme of a URI (e.g. `s3` for `s3://bucket/key`). Plain paths
+    are local files.
+    """
+    if "://" not in uri:
+        return "file"
+    return uri.split("://", 1)[0]
+
+
 def get_destination_module(destination, mapping=MODULE_MAPPING):
     """
     Check that a module exists, return it if it does.
@@ -22,14 +35,14 @@ def get_destination_module(destination, mapping=MODULE_MAPPING):
             f"{', '.join(list(mapping.keys()))}"
         )
     else:
-        return mapping[destination]
+        return importlib.import_module(mapping[destination])
 
 
 def upload_file(path, uri, mapping=MODULE_MAPPING):
     """
     Upload a file to cloud storage.
     """
-    destination = uri[:2]
+    destination = get_scheme(uri)
     module = get_destination_module(destination)
     response = module.upload_file(path, uri)
     return response
@@ -39,7 +52,7 @@ def download_file(uri, path, mapping=MODULE_MAPPING):
     """
     Download a file from cloud storage.
     """
-    destination = uri[:2]
+    destination = get_scheme(uri)
     module = get_destination_module(destination)
     response = module.download_file(uri, path)
     return response
@@ -49,7 +62,7 @@ def list_files(uri):
     """
     List files in cloud storage.
     """
-    destination = uri[:2]
+    destination = get_scheme(uri)
     module = get_destination_module(destination)
     response = module.list_files(uri)
     return response
@@ -59,7 +72,7 @@ def request_to_blob(url, uri, params=None):
     """
     Run a GET request, save the result to S3.
     """
-    destination = uri[:2]
+    destination = get_scheme(uri)
     module = get_destination_module(destination)
     response = module.request_to_blob(url, uri, params=params)
     return response
@@ -68,8 +81,34 @@ def request_to_blob(url, uri, params=None):
 def read_file(uri):
     """
     Read a file from blob storage.
+
+    :raises FileNotFoundError: If the file doesn't exist.
     """
-    destination = uri[:2]
+    destination = get_scheme(uri)
     module = get_destination_module(destination)
     response = module.read_file(uri)
     return response
+
+
+def head_file(uri):
+    """
+    Get the metadata of a file in blob storage without downloading it.
+
+    :raises FileNotFoundError: If the file doesn't exist.
+    :return dict: {etag, size, updated}. The ETag changes whenever the file
+                  is rewritten.
+    """
+    destination = get_scheme(uri)
+    module = get_destination_module(destination)
+    response = module.head_file(uri)
+    return response
+
+
+def write_file(uri, data):
+    """
+    Write a string or bytes to a file in blob storage.
+    """
+    destination = get_scheme(uri)
+    module = get_destination_module(destination)
+    response = module.write_file(uri, data)
+    return response
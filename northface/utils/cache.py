@@ -0,0 +1,277 @@
+"""
+TTL response cache for handler actions.
+
+Actions opt in with the `cacheable` decorator. The handlers then memoize
+their results keyed by resource/action/params. The backend is chosen with
+the CACHE_BACKEND environment variable:
+
+- `memory` (default): an in-process LRU, bounded by entries and bytes.
+- `file`: JSON files in CACHE_DIR, shared by every worker on the host.
+- `none`: caching disabled.
+"""
+
+import collections
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from northface.utils import encoding
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "128"))
+# Every worker holds its own memory cache, so keep it small.
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_DIR = os.getenv(
+    "CACHE_DIR", os.path.join(tempfile.gettempdir(), "northface-cache")
+)
+# Items of a container looked at to estimate its size.
+SIZEOF_SAMPLE = 20
+
+
+def cacheable(ttl, version=None):
+    """
+    Mark an action as cacheable for `ttl` seconds. The function itself is
+    returned unchanged, so its signature and module are preserved.
+
+    :param int ttl: How long a result stays fresh, in seconds.
+    :param callable version: Called with the action's params, returns the
+                             version of the data behind them (e.g. the
+                             latest day loaded). It's part of the key, so
+                             new data is never served from the cache.
+    """
+
+    def decorator(function):
+        function.cache_ttl = ttl
+        function.cache_version = version
+        return function
+
+    return decorator
+
+
+def get_version(function, params):
+    """
+    Get the version of the data an action would read, or None if it isn't
+    versioned (or the version can't be read).
+    """
+    version = getattr(function, "cache_version", None)
+    if version is None:
+        return None
+    try:
+        return version(**params)
+    except Exception as e:
+        logging.warning(f"Couldn't get the version of {function}: {e}")
+        return None
+
+
+def make_key(resource, action, params, version=None):
+    """
+    Build a cache key from normalized params (defaults applied, sorted)
+    and the version of the data, if any.
+    """
+    normalized = json.dumps(params, sort_keys=True, default=str)
+    key = f"{resource}/{action}/{normalized}"
+    return key if version is None else f"{key}@{version}"
+
+
+def sizeof(value, sample=SIZEOF_SAMPLE):
+    """
+    Cheaply estimate how many bytes a cached result takes: the length of
+    strings and binary payloads (e.g. already encoded responses), and for
+    containers the size of their first few items, scaled up to all of them.
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (dict, list, tuple)):
+        items = value.items() if isinstance(value, dict) else value
+        head = list(itertools.islice(items, sample))
+        size = sys.getsizeof(value)
+        if head:
+            sizes = sum(sizeof(item, sample) for item in head)
+            size += sizes * len(value) // len(head)
+        return size
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with per-entry expiry, bounded by both its number
+    of entries and their total size. Results bigger than the whole budget
+    aren't cached.
+    """
+
+    name = "memory"
+
+    def __init__(
+        self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value, _ = entry
+            if expires_at < time.time():
+                self.pop(key)
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        size = sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.pop(key)
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (time.time() + ttl, value, size)
+            self.bytes += size
+            while (
+                len(self.entries) > self.max_entries
+                or self.bytes > self.max_bytes
+            ):
+                self.pop(next(iter(self.entries)))
+
+    def pop(self, key):
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def size(self):
+        return len(self.entries)
+
+
+class FileCache:
+    """
+    Size-bounded cache of JSON files, shared by every process on the host.
+    Recency is tracked with file modification times.
+    """
+
+    name = "file"
+
+    def __init__(self, directory=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path) as fp:
+                entry = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return False, None
+
+        if entry["key"] != key or entry["expires_at"] < time.time():
+            return False, None
+
+        os.utime(path)
+        return True, encoding.load(entry["value"])
+
+    def set(self, key, value, ttl):
+        entry = {
+            "key": key,
+            "expires_at": time.time() + ttl,
+            "value": encoding.dump(value),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(entry, fp)
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+
+    def files(self):
+        return [
+            os.path.join(self.directory, f)
+            for f in os.listdir(self.directory)
+            if f.endswith(".json")
+        ]
+
+    def evict(self):
+        files = self.files()
+        if len(files) <= self.max_entries:
+            return
+
+        def mtime(path):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                return 0
+
+        for path in sorted(files, key=mtime)[: len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def size(self):
+        return len(self.files())
+
+
+BACKENDS = {
+    "memory": MemoryCache,
+    "file": FileCache,
+}
+
+CACHE = None
+STATS = {"hits": 0, "misses": 0}
+STATS_LOCK = threading.Lock()
+
+
+def get_cache(backend=CACHE_BACKEND):
+    """
+    Get the configured cache backend (None if caching is disabled).
+    """
+    global CACHE
+    if CACHE is None and backend in BACKENDS:
+        CACHE = BACKENDS[backend]()
+    elif CACHE is None and backend != "none":
+        logging.warning(f"Unknown cache backend {backend}! Caching is off.")
+    return CACHE
+
+
+def cached_call(key, ttl, function, *args, **kwargs):
+    """
+    Return the cached result for `key`, or call the function and cache it.
+    """
+    cache = get_cache()
+    if cache is None:
+        return function(*args, **kwargs)
+
+    hit, value = cache.get(key)
+    with STATS_LOCK:
+        STATS["hits" if hit else "misses"] += 1
+
+    if hit:
+        return value
+
+    value = function(*args, **kwargs)
+    cache.set(key, value, ttl)
+    return value
+
+
+def get_stats():
+    """
+    Hit/miss counters for this process, plus the backend and its size.
+    """
+    cache = get_cache()
+    return {
+        "backend": cache.name if cache else "none",
+        "size": cache.size() if cache else 0,
+        "hits": STATS["hits"],
+        "misses": STATS["misses"],
+    }
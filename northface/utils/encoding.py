@@ -0,0 +1,108 @@
+"""
+Action results that are sent as they are instead of through the JSON
+encoder: JSON that's already been encoded (e.g. by pandas), binary
+payloads (e.g. Arrow IPC) and streams of newline-delimited JSON.
+"""
+
+import base64
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+JSON_MIMETYPE = "application/json"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Response formats for DataFrames (see `frames.to_format`). `dict` is the
+# original {column: {index: value}} mapping; the others skip the index.
+FORMATS = ["dict", "columns", "records", "split", "arrow"]
+
+
+class EncodedJSON(str):
+    """
+    A string that's already a JSON document, so it isn't encoded again.
+    """
+
+
+def streaming(function):
+    """
+    Mark an action as streaming: it returns a generator of NDJSON chunks
+    that has to be sent as a response body as it's produced. Streaming
+    actions can't run in the background or in a batch, since their
+    results can't be stored or nested in a JSON document.
+    """
+    function.streaming = True
+    return function
+
+
+def is_streaming(function):
+    return getattr(function, "streaming", False)
+
+
+def dumps(obj, default=None, cls=None):
+    """
+    Encode an object as JSON, with orjson if it's installed. orjson encodes
+    NumPy arrays natively and is much faster than the standard library.
+
+    :param callable default: Called by orjson for objects it can't encode.
+    :param type cls: JSON encoder used if orjson isn't installed.
+    :return str: The JSON document.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(obj, default=default, option=option).decode()
+    if cls is not None:
+        return json.dumps(obj, cls=cls)
+    return json.dumps(obj, default=default)
+
+
+def raw_body(value):
+    """
+    Get the body and mimetype to send a pre-encoded result as.
+
+    :return tuple: (body, mimetype), or None if the value should be encoded
+                   as JSON like any other result.
+    """
+    if isinstance(value, EncodedJSON):
+        return str(value), JSON_MIMETYPE
+    if isinstance(value, bytes):
+        return value, ARROW_MIMETYPE
+    return None
+
+
+def embeddable(value):
+    """
+    Get a value that can be nested in a larger JSON response (e.g. one
+    result of a batch): pre-encoded JSON is decoded, binary is base64'd.
+    """
+    if isinstance(value, EncodedJSON):
+        return json.loads(value)
+    return dump(value)
+
+
+def dump(value):
+    """
+    Wrap a result so it survives a round trip through a JSON file store.
+    """
+    if isinstance(value, EncodedJSON):
+        return {"__encoded__": "json", "value": str(value)}
+    if isinstance(value, bytes):
+        return {
+            "__encoded__": "binary",
+            "value": base64.b64encode(value).decode(),
+        }
+    return value
+
+
+def load(value):
+    """
+    Unwrap a result stored with `dump`.
+    """
+    if isinstance(value, dict) and value.get("__encoded__") == "json":
+        return EncodedJSON(value["value"])
+    if isinstance(value, dict) and value.get("__encoded__") == "binary":
+        return base64.b64decode(value["value"])
+    return value
@@ -0,0 +1,232 @@
+"""
+Utilities for serializing pandas DataFrames in API responses.
+"""
+
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from concurrent.futures import ThreadPoolExecutor
+
+from northface.utils.encoding import FORMATS, EncodedJSON
+
+# Significant digits a float32 holds.
+FLOAT32_DIGITS = 7
+
+
+def to_ndjson(df):
+    """
+    Serialize a DataFrame as newline-delimited JSON, one record per line.
+
+    :param pandas.DataFrame df: The frame to serialize.
+    :return str: The records, each terminated by a newline.
+    """
+    if df.empty:
+        return ""
+    df = upcast_floats(df)
+    lines = df.to_json(orient="records", lines=True, date_format="iso")
+    return lines if lines.endswith("\n") else lines + "\n"
+
+
+def to_format(df, format="dict"):
+    """
+    Serialize a DataFrame for a response. JSON formats are encoded by
+    pandas in one pass and returned as EncodedJSON, so they aren't encoded
+    again; `arrow` returns Arrow IPC stream bytes.
+
+    - `dict`: {column: {index: value}} (the original format).
+    - `columns`: {column: [values]}
+    - `records`: [{column: value}]
+    - `split`: {"columns": [columns], "data": [[row values]]}
+    - `arrow`: Arrow IPC stream, with the column types kept.
+
+    :param pandas.DataFrame df: The frame to serialize.
+    :param str format: One of FORMATS.
+    :raises ValueError: If the format isn't supported.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Format {format} is invalid! Use one of {FORMATS}.")
+
+    if format == "arrow":
+        return to_arrow(df)
+
+    df = format_dates(upcast_floats(df))
+    if format == "dict":
+        return df.to_dict()
+    if format == "columns":
+        return EncodedJSON(
+            "{"
+            + ",".join(
+                f"{json.dumps(str(column))}:"
+                + df[column].to_json(orient="values")
+                for column in df.columns
+            )
+            + "}"
+        )
+    if format == "split":
+        return EncodedJSON(df.to_json(orient="split", index=False))
+    return EncodedJSON(df.to_json(orient="records"))
+
+
+def to_arrow(df):
+    """
+    Serialize a DataFrame as an Arrow IPC stream.
+
+    :return bytes: The stream.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def format_dates(df):
+    """
+    Convert datetime columns back to strings for JSON responses: dates as
+    '%Y-%m-%d', timestamps as '%Y-%m-%d %H:%M:%S'. Nulls stay null.
+
+    :param pandas.DataFrame df: The frame to convert (not modified).
+    """
+    df = df.copy(deep=False)
+    for column in df.select_dtypes(include="datetime").columns:
+        values = df[column]
+        dates_only = (values.dropna() == values.dropna().dt.normalize()).all()
+        fmt = "%Y-%m-%d" if dates_only else "%Y-%m-%d %H:%M:%S"
+        df[column] = values.dt.strftime(fmt).astype(object)
+        df.loc[values.isna(), column] = None
+    return df
+
+
+def upcast_floats(df):
+    """
+    Convert float32 columns to float64, rounded to the digits a float32
+    holds, for JSON responses and sums: 41.87 stored as float32 is sent as
+    41.87, not 41.869998931884766. Only Arrow responses carry float32.
+
+    :param pandas.DataFrame df: The frame to convert (not modified).
+    """
+    columns = df.select_dtypes(include="float32").columns
+    if columns.empty:
+        return df
+    df = df.copy(deep=False)
+    for column in columns:
+        values = df[column].to_numpy(dtype="float64")
+        df[column] = round_significant(values, FLOAT32_DIGITS)
+    return df
+
+
+def round_significant(values, digits):
+    """
+    Round floats to a number of significant digits. Whole numbers (e.g.
+    counts) are kept as they are.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decimals = digits - 1 - np.floor(np.log10(np.abs(values)))
+        scale = 10.0 ** np.abs(decimals)
+        rounded = np.where(
+            decimals >= 0,
+            np.round(values * scale) / scale,
+            np.round(values / scale) * scale,
+        )
+    keep = ~np.isfinite(rounded) | (values == np.trunc(values))
+    return np.where(keep, values, rounded)
+
+
+def concat_categoricals(dfs):
+    """
+    Concatenate DataFrames, keeping categorical columns categorical (plain
+    `pd.concat` falls back to object when the categories differ).
+
+    :param list dfs: DataFrames with the same columns.
+    :return pandas.DataFrame: One frame with a fresh index.
+    """
+    dfs = list(dfs)
+    if not dfs:
+        return pd.DataFrame()
+
+    for column in dfs[0].select_dtypes(include="category").columns:
+        categories = pd.Index(
+            sorted(set().union(*(df[column].cat.categories for df in dfs)))
+        )
+        dfs = [
+            df.assign(**{column: df[column].cat.set_categories(categories)})
+            for df in dfs
+        ]
+    return pd.concat(dfs, ignore_index=True)
+
+
+def stream_csvs(paths, chunksize):
+    """
+    Read CSVs chunk by chunk, yielding each chunk as newline-delimited JSON
+    as soon as it's parsed.
+
+    :param list paths: Paths/URIs of the CSVs, in the order to send them.
+    :param int chunksize: Number of rows to read and send at a time.
+    """
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield to_ndjson(chunk)
+
+
+def read_many(paths, reader=pd.read_csv, max_workers=8, **kwargs):
+    """
+    Read many files concurrently on a bounded thread pool. Reads from blob
+    storage are dominated by network latency, so this is close to linear.
+
+    :param list paths: Paths/URIs to read.
+    :param callable reader: Reads one path into a DataFrame.
+    :param int max_workers: Maximum number of reads in flight.
+    :param kwargs: Passed to the reader.
+    :raises RuntimeError: Naming every path that failed to read.
+    :return list: DataFrames in the same order as `paths`.
+    """
+
+    def read(path):
+        try:
+            return reader(path, **kwargs), None
+        except Exception as e:
+            return None, f"{path}: {e}"
+
+    if not paths:
+        return []
+
+    workers = max(1, min(int(max_workers), len(paths)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(read, paths))
+
+    errors = [error for _, error in results if error]
+    if errors:
+        raise RuntimeError(
+            f"Failed to read {len(errors)} file(s): " + "; ".join(errors)
+        )
+    return [df for df, _ in results]
+
+
+def to_grouped_parquet(df, column):
+    """
+    Serialize a DataFrame as Parquet with one row group per value of a
+    column. Readers filtering on that column (`filters=[(column, "in",
+    values)]`) then skip every other group using the row group statistics.
+
+    :param pandas.DataFrame df: The frame to serialize.
+    :param str column: Column to group rows by.
+    :return bytes: The Parquet file.
+    """
+    df = df.sort_values([column], kind="stable").reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, table.schema) as writer:
+        if df.empty:
+            writer.write_table(table)
+        # Rows are sorted, so each group is one contiguous slice.
+        bounds = df.groupby(column, sort=False, dropna=False).size().cumsum()
+        start = 0
+        for stop in bounds:
+            writer.write_table(table.slice(start, stop - start))
+            start = stop
+    return buffer.getvalue()
@@ -76,5 +76,43 @@ def read_file(uri):
     bucket_name, prefix = parse_uri(uri)
     bucket = storage_client.get_bucket(bucket_name)
     blob = bucket.get_blob(prefix)
+    if blob is None:
+        raise FileNotFoundError(uri)
     text = blob.download_as_string()
     return text
+
+
+def head_file(uri):
+    """
+    Get the metadata of a blob in GCS without downloading it. The ETag is
+    the blob's generation, which changes every time it's written.
+
+    :param str uri: The GS URI.
+    :raises FileNotFoundError: If the blob doesn't exist.
+    :return dict: {etag, size, updated}
+    """
+    storage_client = storage.Client()
+    bucket_name, blob_name = parse_uri(uri)
+    bucket = storage_client.bucket(bucket_name)
+    blob = bucket.get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(uri)
+    return {
+        "etag": str(blob.generation),
+        "size": blob.size,
+        "updated": blob.updated.timestamp() if blob.updated else None,
+    }
+
+
+def write_file(uri, data):
+    """
+    Write a string or bytes to a blob in GCS.
+
+    :param str uri: The GS URI to write to.
+    :param str data: The contents of the file.
+    """
+    storage_client = storage.Client()
+    bucket_name, blob_name = parse_uri(uri)
+    bucket = storage_client.bucket(bucket_name)
+    blob = bucket.blob(blob_name)
+    return blob.upload_from_string(data)
@@ -0,0 +1,271 @@
+"""
+Run long actions in the background and let clients poll for the result.
+
+Jobs run on a small thread pool in the worker process that accepted them.
+Their status and results are kept as JSON files in a shared directory, so
+any gunicorn worker can answer a status/result poll. Finished jobs are
+pruned after a retention period, and the number of stored jobs is bounded.
+"""
+
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+from northface.utils import encoding
+
+JOBS_DIR = os.getenv(
+    "JOBS_DIR", os.path.join(tempfile.gettempdir(), "northface-jobs")
+)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_MAX_STORED = int(os.getenv("JOB_MAX_STORED", "100"))
+# Jobs each worker process accepts before it has finished them. The pool's
+# queue is unbounded, so past this new jobs are refused instead of queued.
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+EXECUTOR = None
+EXECUTOR_LOCK = threading.Lock()
+ACTIVE_JOBS = 0
+ACTIVE_JOBS_LOCK = threading.Lock()
+
+
+class QueueFull(RuntimeError):
+    """
+    Too many jobs are pending or running to accept another one.
+    """
+
+
+def get_executor():
+    """
+    Get the job pool, creating it on first use (after gunicorn forks).
+    """
+    global EXECUTOR
+    with EXECUTOR_LOCK:
+        if EXECUTOR is None:
+            EXECUTOR = ThreadPoolExecutor(
+                max_workers=JOB_WORKERS, thread_name_prefix="job"
+            )
+    return EXECUTOR
+
+
+def status_path(job_id, jobs_dir=JOBS_DIR):
+    return os.path.join(jobs_dir, f"{job_id}.json")
+
+
+def result_path(job_id, jobs_dir=JOBS_DIR):
+    return os.path.join(jobs_dir, f"{job_id}.result")
+
+
+def write_json(path, obj):
+    """
+    Atomically write an object as JSON, so readers never see partial files.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as fp:
+        json.dump(obj, fp)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def update_status(job_id, jobs_dir=JOBS_DIR, **fields):
+    """
+    Update a job's status. Does nothing (and returns None) if the job was
+    removed, so a pruned job isn't recreated without its metadata.
+    """
+    status = read_json(status_path(job_id, jobs_dir))
+    if status is None:
+        return None
+    status.update(fields)
+    write_json(status_path(job_id, jobs_dir), status)
+    return status
+
+
+def remove_job(job_id, jobs_dir=JOBS_DIR):
+    for path in [status_path(job_id, jobs_dir), result_path(job_id, jobs_dir)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def prune(
+    jobs_dir=JOBS_DIR,
+    retention_seconds=JOB_RETENTION_SECONDS,
+    max_stored=JOB_MAX_STORED,
+):
+    """
+    Drop finished jobs older than the retention period, then the oldest
+    finished jobs until at most `max_stored` are left. Pending and running
+    jobs are never dropped, and malformed status files are skipped.
+    """
+    now = time.time()
+    jobs = []
+    for path in glob.glob(os.path.join(jobs_dir, "*.json")):
+        status = read_json(path)
+        if (
+            not status
+            or "job_id" not in status
+            or "submitted_at" not in status
+        ):
+            continue
+        finished_at = status.get("finished_at") or status["submitted_at"]
+        if (
+            status.get("status") in [SUCCEEDED, FAILED]
+            and now - finished_at > retention_seconds
+        ):
+            remove_job(status["job_id"], jobs_dir)
+        else:
+            jobs.append(status)
+
+    finished = sorted(
+        [j for j in jobs if j.get("status") in [SUCCEEDED, FAILED]],
+        key=lambda j: j["submitted_at"],
+    )
+    excess = len(jobs) - max_stored
+    for status in finished[: max(excess, 0)]:
+        remove_job(status["job_id"], jobs_dir)
+
+
+def run(job_id, function, args, context=None, jobs_dir=JOBS_DIR):
+    """
+    Run a job and record its outcome.
+    """
+    if not update_status(
+        job_id, jobs_dir, status=RUNNING, started_at=time.time()
+    ):
+        logging.warning(f"Job {job_id} was removed before it started!")
+        return
+
+    try:
+        if context:
+            with context():
+                result = function(**args)
+        else:
+            result = function(**args)
+        write_json(result_path(job_id, jobs_dir), encoding.dump(result))
+        if not update_status(
+            job_id, jobs_dir, status=SUCCEEDED, finished_at=time.time()
+        ):
+            remove_job(job_id, jobs_dir)
+
+    except Exception as e:
+        logging.exception(f"Job {job_id} failed!")
+        update_status(
+            job_id,
+            jobs_dir,
+            status=FAILED,
+            finished_at=time.time(),
+            error=str(e),
+        )
+
+
+def submit(
+    name,
+    function,
+    args,
+    context=None,
+    jobs_dir=JOBS_DIR,
+    max_pending=JOB_MAX_PENDING,
+):
+    """
+    Queue a function to run in the background.
+
+    :param str name: Human readable name of the job (e.g. `corona/fetch_plots`)
+    :param callable function: The function to run.
+    :param dict args: Keyword arguments for the function.
+    :param callable context: Returns a context manager to run the job in.
+    :param int max_pending: Most jobs this process runs or queues at once.
+    :raises QueueFull: If `max_pending` jobs haven't finished yet.
+    :return dict: The status of the new job, including its `job_id`.
+    """
+    global ACTIVE_JOBS
+    with ACTIVE_JOBS_LOCK:
+        if ACTIVE_JOBS >= max_pending:
+            raise QueueFull(
+                f"Too many jobs! {ACTIVE_JOBS} are pending or running, "
+                "try again later."
+            )
+        ACTIVE_JOBS += 1
+
+    try:
+        prune(jobs_dir)
+        job_id = uuid.uuid4().hex
+        status = {
+            "job_id": job_id,
+            "name": name,
+            "status": PENDING,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        write_json(status_path(job_id, jobs_dir), status)
+        future = get_executor().submit(
+            run, job_id, function, args, context, jobs_dir
+        )
+    except Exception:
+        release()
+        raise
+
+    future.add_done_callback(lambda _: release())
+    return status
+
+
+def release():
+    """
+    Free the slot of a job that finished (or couldn't be queued).
+    """
+    global ACTIVE_JOBS
+    with ACTIVE_JOBS_LOCK:
+        ACTIVE_JOBS -= 1
+
+
+def get_status(job_id, jobs_dir=JOBS_DIR):
+    """
+    Get the status of a job.
+
+    :raises KeyError: If the job doesn't exist (or was pruned).
+    """
+    status = read_json(status_path(os.path.basename(job_id), jobs_dir))
+    if status is None:
+        raise KeyError(f"Job {job_id} not found!")
+    return status
+
+
+def get_result(job_id, jobs_dir=JOBS_DIR):
+    """
+    Get the result of a finished job.
+
+    :raises KeyError: If the job doesn't exist (or was pruned).
+    :raises RuntimeError: If the job failed.
+    :return tuple(dict, object): The job's status and its result (None if
+                                 it hasn't finished yet).
+    """
+    status = get_status(job_id, jobs_dir)
+    if status["status"] == FAILED:
+        raise RuntimeError(status["error"])
+    if status["status"] != SUCCEEDED:
+        return status, None
+    result = read_json(result_path(status["job_id"], jobs_dir))
+    return status, encoding.load(result)
@@ -0,0 +1,100 @@
+"""
+Local filesystem backend for blob storage. Handles plain paths and
+`file://` URIs with the same interface as the S3 and GCS backends, so the
+ETLs and API can run offline (local development, benchmarks). Prefer plain
+paths: pandas can read `file://` URIs but can't write to them.
+"""
+
+import os
+import requests
+import shutil
+
+
+def parse_uri(uri):
+    return uri.replace("file://", "", 1)
+
+
+def upload_file(path, uri):
+    """
+    Copy a file into local storage.
+    """
+    destination = parse_uri(uri)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    return shutil.copyfile(path, destination)
+
+
+def download_file(uri, path):
+    """
+    Copy a file out of local storage.
+    """
+    return shutil.copyfile(parse_uri(uri), path)
+
+
+def list_files(uri):
+    """
+    List all the files under a given URI.
+    """
+    root = parse_uri(uri)
+    keys = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            keys.append(os.path.join(dirpath, filename))
+    return sorted(keys)
+
+
+def request_to_blob(url, uri, params=None):
+    """
+    Make a GET request, save the Response.text to local storage.
+
+    :param str url: The URL to GET.
+    :param str uri: The file URI to save the data to.
+    """
+    response = requests.get(url, params=params)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Response was: {response}, not 200!")
+
+    destination = parse_uri(uri)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with open(destination, "w") as fp:
+        fp.write(response.text)
+
+    return destination
+
+
+def read_file(uri):
+    """
+    Read the contents of a local file.
+
+    :param str uri: The file URI to read.
+    :return bytes: The contents of the file.
+    """
+    with open(parse_uri(uri), "rb") as fp:
+        return fp.read()
+
+
+def head_file(uri):
+    """
+    Get the metadata of a local file. The ETag changes whenever the file's
+    modification time or size does.
+
+    :raises FileNotFoundError: If the file doesn't exist.
+    :return dict: {etag, size, updated}
+    """
+    stat = os.stat(parse_uri(uri))
+    return {
+        "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+        "size": stat.st_size,
+        "updated": stat.st_mtime,
+    }
+
+
+def write_file(uri, data):
+    """
+    Write a string or bytes to a local file.
+    """
+    destination = parse_uri(uri)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with open(destination, "wb" if isinstance(data, bytes) else "w") as fp:
+        fp.write(data)
+    return destination
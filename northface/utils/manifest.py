@@ -0,0 +1,201 @@
+"""
+Manifests indexing the partitions of a dataset, so readers can find the
+latest data with one GET instead of listing a whole prefix.
+
+A dataset's tables live next to each other (e.g. `corona/clean` and
+`corona/consolidated`) and share one manifest beside them
+(`corona/manifest.json`), outside of every table's prefix:
+
+    {
+        "updated_at": 1600000000.0,
+        "tables": {
+            "clean": {
+                "latest": "03-23-2020",
+                "partitions": {
+                    "03-23-2020": {
+                        "uri": "s3://.../corona/clean/03-23-2020.csv",
+                        "date": "2020-03-23",
+                        "rows": 3000,
+                        "bytes": 250000,
+                        "sha256": "...",
+                        "updated_at": 1600000000.0
+                    }
+                }
+            }
+        }
+    }
+
+Manifests are updated with a read-modify-write, so each dataset should
+only have one writer (its ETL) at a time. The first time a table is added
+to a manifest, the files already in it are indexed from a listing.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from northface.utils import blob
+
+MANIFEST_NAME = "manifest.json"
+INDEX_WORKERS = int(os.getenv("MANIFEST_INDEX_WORKERS", "16"))
+
+
+def get_uri(table_uri):
+    """
+    Get the URI of the manifest for a table (in the table's parent).
+    """
+    return f"{os.path.dirname(table_uri.rstrip('/'))}/{MANIFEST_NAME}"
+
+
+def get_table(table_uri):
+    return os.path.basename(table_uri.rstrip("/"))
+
+
+def read(manifest_uri):
+    """
+    Read a manifest.
+
+    :raises FileNotFoundError: If there's no manifest.
+    """
+    data = blob.read_file(manifest_uri)
+    return json.loads(data.decode() if isinstance(data, bytes) else data)
+
+
+def describe(name, uri, data, rows=None, date=None):
+    """
+    Describe a partition from the data that was written to it.
+
+    :param str name: Name of the partition (e.g. `03-23-2020`).
+    :param str uri: Where the partition was written.
+    :param data: The partition's content (str or bytes).
+    :param int rows: Number of rows in the partition.
+    :param datetime date: Date of the partition's data, used to order
+                          partitions. Partitions are ordered by name if
+                          they don't have one.
+    """
+    data = data.encode() if isinstance(data, str) else data
+    return {
+        "name": name,
+        "uri": uri,
+        "date": date.strftime("%Y-%m-%d") if date else None,
+        "rows": None if rows is None else int(rows),
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "updated_at": time.time(),
+    }
+
+
+def sort_key(partition):
+    return (partition.get("date") or "", partition["name"])
+
+
+def count_rows(uri, data):
+    """
+    Count the rows of a CSV or Parquet file (None for other files).
+    """
+    if uri.endswith(".csv"):
+        import pandas as pd
+
+        return len(pd.read_csv(io.BytesIO(data), usecols=[0]))
+    if uri.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(io.BytesIO(data)).metadata.num_rows
+    return None
+
+
+def index(table_uri, date_format=None, max_workers=INDEX_WORKERS):
+    """
+    Describe every file already in a table, from a listing.
+
+    :param str date_format: Format of the dates in the file names, if any.
+    :return list: Partitions from `describe`.
+    """
+
+    def describe_key(key):
+        uri = f"{table_uri.rstrip('/')}/{os.path.basename(key)}"
+        name = os.path.splitext(os.path.basename(key))[0]
+        data = blob.read_file(uri)
+        data = data.encode() if isinstance(data, str) else data
+        date = None
+        if date_format:
+            try:
+                date = datetime.strptime(name, date_format)
+            except ValueError:
+                pass
+        return describe(name, uri, data, rows=count_rows(uri, data), date=date)
+
+    keys = blob.list_files(table_uri)
+    logging.info(f"Indexing {len(keys)} files in {table_uri}...")
+    if not keys:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as pool:
+        return list(pool.map(describe_key, keys))
+
+
+def add_partitions(table_uri, partitions, date_format=None):
+    """
+    Add (or replace) partitions of a table in its dataset's manifest.
+
+    :param str table_uri: URI of the table (e.g. `s3://.../corona/clean`).
+    :param list partitions: Partitions from `describe`.
+    :param str date_format: Format of the dates in the file names, used if
+                            the table's existing files have to be indexed.
+    :return dict: The updated manifest.
+    """
+    manifest_uri = get_uri(table_uri)
+    try:
+        manifest = read(manifest_uri)
+    except FileNotFoundError:
+        manifest = {"tables": {}}
+
+    if get_table(table_uri) not in manifest["tables"]:
+        partitions = index(table_uri, date_format=date_format) + list(
+            partitions
+        )
+
+    table = manifest["tables"].setdefault(
+        get_table(table_uri), {"latest": None, "partitions": {}}
+    )
+    for partition in partitions:
+        table["partitions"][partition["name"]] = partition
+    if table["partitions"]:
+        table["latest"] = max(table["partitions"].values(), key=sort_key)[
+            "name"
+        ]
+
+    manifest["updated_at"] = time.time()
+    blob.write_file(manifest_uri, json.dumps(manifest, indent=2))
+    return manifest
+
+
+def get_partitions(table_uri):
+    """
+    Get a table's partitions, oldest first.
+
+    :raises FileNotFoundError: If the table isn't in a manifest.
+    """
+    manifest = read(get_uri(table_uri))
+    table = manifest["tables"].get(get_table(table_uri))
+    if not table:
+        raise FileNotFoundError(f"{table_uri} isn't in the manifest!")
+    return sorted(table["partitions"].values(), key=sort_key)
+
+
+def get_latest(table_uri):
+    """
+    Get the name of a table's latest partition.
+
+    :raises FileNotFoundError: If the table isn't in a manifest.
+    """
+    manifest = read(get_uri(table_uri))
+    table = manifest["tables"].get(get_table(table_uri))
+    if not table or not table["latest"]:
+        raise FileNotFoundError(f"{table_uri} isn't in the manifest!")
+    return table["latest"]
@@ -0,0 +1,275 @@
+"""
+Per resource/action request counters, error counts and latency histograms.
+
+Each process keeps its own counters and mirrors them to a JSON file in
+METRICS_DIR, at most every METRICS_WRITE_INTERVAL seconds. Readers merge
+every live process's file, so the numbers are correct no matter which
+gunicorn worker serves /metrics. Files of dead processes are removed.
+"""
+
+import contextlib
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "northface-metrics")
+)
+# Seconds between two writes of a process's counters.
+METRICS_WRITE_INTERVAL = float(os.getenv("METRICS_WRITE_INTERVAL", "5"))
+# Files not written for this long are dropped, even if their PID is alive
+# (it may have been recycled).
+METRICS_FILE_TTL = int(os.getenv("METRICS_FILE_TTL", str(24 * 3600)))
+
+# Upper bounds of the latency histogram buckets, in seconds.
+BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+METRICS = {}
+METRICS_LOCK = threading.Lock()
+LAST_WRITE = 0.0
+
+# The start time keeps a recycled PID from overwriting a dead worker's file.
+PROCESS_FILE = f"metrics-{os.getpid()}-{int(time.time() * 1000)}.json"
+
+
+def new_series():
+    return {
+        "count": 0,
+        "errors": 0,
+        "sum": 0.0,
+        "buckets": [0] * (len(BUCKETS) + 1),
+    }
+
+
+def write_snapshot(metrics_dir=METRICS_DIR):
+    """
+    Mirror this process's counters to its file in the metrics directory.
+    Callers hold METRICS_LOCK.
+    """
+    global PROCESS_FILE, LAST_WRITE
+    LAST_WRITE = time.monotonic()
+    if not PROCESS_FILE.startswith(f"metrics-{os.getpid()}-"):
+        # Forked after import (gunicorn preload): don't share the parent's.
+        PROCESS_FILE = f"metrics-{os.getpid()}-{int(time.time() * 1000)}.json"
+
+    os.makedirs(metrics_dir, exist_ok=True)
+    snapshot = [
+        {"resource": resource, "action": action, **series}
+        for (resource, action), series in METRICS.items()
+    ]
+    fd, tmp_path = tempfile.mkstemp(dir=metrics_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as fp:
+        json.dump(snapshot, fp)
+    os.replace(tmp_path, os.path.join(metrics_dir, PROCESS_FILE))
+
+
+def record(resource, action, seconds, error=False):
+    """
+    Record one call of an action.
+
+    :param str resource: Name of the resource (e.g. `corona`).
+    :param str action: Name of the action (e.g. `fetch_plots`).
+    :param float seconds: How long the call took.
+    :param bool error: Whether the call raised.
+    """
+    with METRICS_LOCK:
+        series = METRICS.setdefault((resource, action), new_series())
+        series["count"] += 1
+        series["errors"] += int(error)
+        series["sum"] += seconds
+        bucket = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                bucket = i
+                break
+        series["buckets"][bucket] += 1
+        if time.monotonic() - LAST_WRITE >= METRICS_WRITE_INTERVAL:
+            write_snapshot()
+
+
+def flush(metrics_dir=METRICS_DIR):
+    """
+    Write this process's counters now, whatever the interval.
+    """
+    with METRICS_LOCK:
+        write_snapshot(metrics_dir)
+
+
+@contextlib.contextmanager
+def timed(resource, action):
+    """
+    Time a block of code and record it against a resource/action.
+    """
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record(resource, action, time.perf_counter() - start, error=error)
+
+
+def timed_chunks(resource, action, chunks, start=None):
+    """
+    Pass a streamed response through, recording it against a
+    resource/action once it's been sent, so the latency covers producing
+    every chunk and not just starting the stream.
+
+    :param float start: When the action started (`time.perf_counter`).
+    """
+    start = time.perf_counter() if start is None else start
+    error = False
+    try:
+        yield from chunks
+    except Exception:
+        error = True
+        raise
+    finally:
+        record(resource, action, time.perf_counter() - start, error=error)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_stale(path, ttl=METRICS_FILE_TTL):
+    """
+    Whether a snapshot belongs to a process that's gone: its PID doesn't
+    exist anymore, or it hasn't been written for `ttl` seconds.
+    """
+    try:
+        pid = int(os.path.basename(path).split("-")[1])
+        return not is_alive(pid) or time.time() - os.path.getmtime(path) > ttl
+    except (IndexError, ValueError):
+        return True
+
+
+def collect(metrics_dir=METRICS_DIR, ttl=METRICS_FILE_TTL):
+    """
+    Merge the counters of every live process that has written a snapshot,
+    starting with an up to date one from this process. Snapshots of dead
+    processes are removed.
+
+    :return dict: {(resource, action): series}
+    """
+    flush(metrics_dir)
+    merged = {}
+    for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+        try:
+            if is_stale(path, ttl) and not path.endswith(PROCESS_FILE):
+                os.remove(path)
+                continue
+            with open(path) as fp:
+                snapshot = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            continue
+
+        for series in snapshot:
+            key = (series["resource"], series["action"])
+            total = merged.setdefault(key, new_series())
+            total["count"] += series["count"]
+            total["errors"] += series["errors"]
+            total["sum"] += series["sum"]
+            total["buckets"] = [
+                a + b for a, b in zip(total["buckets"], series["buckets"])
+            ]
+    return merged
+
+
+def to_prometheus(metrics):
+    """
+    Render merged metrics in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP northface_action_requests_total Calls per resource/action.",
+        "# TYPE northface_action_requests_total counter",
+    ]
+    for (resource, action), series in sorted(metrics.items()):
+        labels = f'resource="{resource}",action="{action}"'
+        lines.append(
+            f"northface_action_requests_total{{{labels}}} {series['count']}"
+        )
+
+    lines += [
+        "# HELP northface_action_errors_total Failed calls per "
+        "resource/action.",
+        "# TYPE northface_action_errors_total counter",
+    ]
+    for (resource, action), series in sorted(metrics.items()):
+        labels = f'resource="{resource}",action="{action}"'
+        lines.append(
+            f"northface_action_errors_total{{{labels}}} {series['errors']}"
+        )
+
+    lines += [
+        "# HELP northface_action_duration_seconds Latency per "
+        "resource/action.",
+        "# TYPE northface_action_duration_seconds histogram",
+    ]
+    for (resource, action), series in sorted(metrics.items()):
+        labels = f'resource="{resource}",action="{action}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ["+Inf"], series["buckets"]):
+            cumulative += count
+            lines.append(
+                "northface_action_duration_seconds_bucket"
+                f'{{{labels},le="{bound}"}} {cumulative}'
+            )
+        lines.append(
+            f"northface_action_duration_seconds_sum{{{labels}}} "
+            f"{series['sum']}"
+        )
+        lines.append(
+            f"northface_action_duration_seconds_count{{{labels}}} "
+            f"{series['count']}"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def quantile(series, q):
+    """
+    Estimate a latency quantile from a histogram (upper bucket bound).
+    """
+    target = q * series["count"]
+    cumulative = 0
+    for bound, count in zip(BUCKETS + [None], series["buckets"]):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return None
+
+
+def mean(series):
+    if not series["count"]:
+        return None
+    return round(series["sum"] / series["count"], 4)
+
+
+def summary(metrics):
+    """
+    Summarize metrics as plain JSON-friendly dicts (e.g. for Lambda logs).
+    """
+    return [
+        {
+            "resource": resource,
+            "action": action,
+            "count": series["count"],
+            "errors": series["errors"],
+            "mean_seconds": mean(series),
+            "p50_seconds": quantile(series, 0.5),
+            "p95_seconds": quantile(series, 0.95),
+        }
+        for (resource, action), series in sorted(metrics.items())
+    ]
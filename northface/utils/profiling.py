@@ -0,0 +1,204 @@
+"""
+Profile individual requests on demand.
+
+A request that sends the profiling secret (PROFILE_SECRET, loaded by the
+secrets bootstrap like every other secret) in the X-Profile header has its
+action run under cProfile, and optionally tracemalloc. The slowest frames
+come back in a response header; the full report is stored in PROFILE_DIR
+and can be downloaded by its ID.
+"""
+
+import contextlib
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import tempfile
+import threading
+import tracemalloc
+import uuid
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_MEMORY_HEADER = "X-Profile-Memory"
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "northface-profiles")
+)
+TOP_FRAMES = 5
+REPORT_FRAMES = 50
+
+REQUEST = threading.local()
+
+
+def authorize(secret):
+    """
+    Check a secret sent by a client against PROFILE_SECRET. Profiling is
+    disabled if no secret is configured.
+    """
+    expected = os.environ.get("PROFILE_SECRET")
+    if not expected or not secret:
+        return False
+    return hmac.compare_digest(expected.encode(), secret.encode())
+
+
+def enable(memory=False):
+    """
+    Profile the next action run on this thread.
+    """
+    REQUEST.options = {"memory": memory}
+    REQUEST.report = None
+
+
+def disable():
+    """
+    Stop profiling this thread and return the report, if any.
+    """
+    report = getattr(REQUEST, "report", None)
+    REQUEST.options = None
+    REQUEST.report = None
+    return report
+
+
+def is_enabled():
+    return bool(getattr(REQUEST, "options", None))
+
+
+def format_frame(key, stat):
+    filename, line, function = key
+    cumulative = stat[3]
+    return f"{cumulative:.3f}s {function} {os.path.basename(filename)}:{line}"
+
+
+def build_report(profiler, snapshot=None, report_id=None):
+    """
+    Summarize a profile: the top frames by cumulative time, plus the full
+    text report (and allocations, if traced).
+    """
+    stats = pstats.Stats(profiler)
+    stats.sort_stats("cumulative")
+    top = [
+        format_frame(key, stats.stats[key])
+        for key in stats.fcn_list[:TOP_FRAMES]
+    ]
+
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(
+        REPORT_FRAMES
+    )
+
+    if snapshot is not None:
+        text.write("\nTop allocations:\n")
+        for stat in snapshot.statistics("lineno")[:REPORT_FRAMES]:
+            text.write(f"{stat}\n")
+
+    return {
+        "id": report_id or uuid.uuid4().hex,
+        "top": top,
+        "text": text.getvalue(),
+    }
+
+
+def save_report(report, profile_dir=PROFILE_DIR):
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{report['id']}.txt")
+    with open(path, "w") as fp:
+        fp.write(report["text"])
+    return path
+
+
+def load_report(report_id, profile_dir=PROFILE_DIR):
+    """
+    Read a stored profile report.
+
+    :raises KeyError: If the report doesn't exist.
+    """
+    path = os.path.join(profile_dir, f"{os.path.basename(report_id)}.txt")
+    try:
+        with open(path) as fp:
+            return fp.read()
+    except FileNotFoundError:
+        raise KeyError(f"Profile {report_id} not found!")
+
+
+@contextlib.contextmanager
+def profiled():
+    """
+    Profile a block of code if profiling is enabled for this thread.
+    """
+    if not is_enabled():
+        yield
+        return
+
+    memory = REQUEST.options["memory"]
+    if memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = None
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        report = build_report(profiler, snapshot)
+        save_report(report)
+        REQUEST.report = report
+        # Only profile one action per request.
+        REQUEST.options = None
+
+
+def profiled_chunks(chunks):
+    """
+    Profile a streamed response while its chunks are produced, if
+    profiling is enabled for this thread. The response headers go out
+    before the stream, so they only carry the report's ID; the report is
+    stored once the stream ends.
+    """
+    if not is_enabled():
+        return chunks
+
+    memory = REQUEST.options["memory"]
+    report_id = uuid.uuid4().hex
+    REQUEST.report = {
+        "id": report_id,
+        "top": ["streamed, download the report once the response ends"],
+        "text": "",
+    }
+    REQUEST.options = None
+    return _profile_chunks(chunks, memory, report_id)
+
+
+def _profile_chunks(chunks, memory, report_id):
+    if memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    chunks = iter(chunks)
+    try:
+        while True:
+            # Only profile producing chunks, not the server sending them.
+            profiler.enable()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                profiler.disable()
+            yield chunk
+    finally:
+        snapshot = None
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        save_report(build_report(profiler, snapshot, report_id=report_id))
+
+
+def report_headers(report):
+    """
+    Response headers describing a profile report.
+    """
+    return {
+        "X-Profile-Id": report["id"],
+        "X-Profile-Top": " | ".join(report["top"]),
+    }
@@ -88,3 +88,57 @@ def request_to_blob(url, uri, params=None):
         response = upload_file(fp.name, uri)
 
     return response
+
+
+def read_file(uri):
+    """
+    Read the contents of a file in S3.
+
+    :param str uri: S3 uri (s3://bucket/key.csv)
+    :raises FileNotFoundError: If the key doesn't exist.
+    :return bytes: The contents of the file.
+    """
+    s3 = boto3.client("s3", region_name="us-east-1")
+    bucket, key = parse_uri(uri)
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        raise FileNotFoundError(uri)
+    return response["Body"].read()
+
+
+def head_file(uri):
+    """
+    Get the metadata of a file in S3 without downloading it.
+
+    :param str uri: S3 uri (s3://bucket/key.csv)
+    :raises FileNotFoundError: If the key doesn't exist.
+    :return dict: {etag, size, updated}
+    """
+    s3 = boto3.client("s3", region_name="us-east-1")
+    bucket, key = parse_uri(uri)
+    try:
+        response = s3.head_object(Bucket=bucket, Key=key)
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ["404", "NoSuchKey"]:
+            raise FileNotFoundError(uri)
+        raise
+    return {
+        "etag": response["ETag"].strip('"'),
+        "size": response["ContentLength"],
+        "updated": response["LastModified"].timestamp(),
+    }
+
+
+def write_file(uri, data):
+    """
+    Write a string or bytes to a file in S3.
+
+    :param str uri: S3 uri (s3://bucket/key.csv)
+    :param str data: The contents of the file.
+    """
+    s3 = boto3.client("s3", region_name="us-east-1")
+    bucket, key = parse_uri(uri)
+    if isinstance(data, str):
+        data = data.encode()
+    return s3.put_object(Bucket=bucket, Key=key, Body=data)
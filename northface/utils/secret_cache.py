@@ -0,0 +1,189 @@
+"""
+One place to load secrets from AWS Secrets Manager or GCP Secret Manager.
+
+Secrets are kept in memory for SECRET_TTL seconds. Once stale, the cached
+value keeps being served while it's refreshed in the background. If
+SECRET_SNAPSHOT_KEY (a Fernet key) is set, secrets are also written to an
+encrypted local snapshot, so a restarting worker can boot from it without
+waiting on the network and refresh in the background.
+"""
+
+import base64
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # pragma: no cover
+    Fernet = InvalidToken = None
+
+SECRET_TTL = int(os.getenv("SECRET_TTL", "3600"))
+SNAPSHOT_KEY = os.getenv("SECRET_SNAPSHOT_KEY")
+SNAPSHOT_PATH = os.getenv(
+    "SECRET_SNAPSHOT_PATH",
+    os.path.join(tempfile.gettempdir(), "northface-secrets.snapshot"),
+)
+
+CACHE = {}
+CACHE_LOCK = threading.RLock()
+REFRESHING = set()
+
+
+def jana_fetcher(provider):
+    """
+    Default fetcher: read the secret with jana.
+    """
+
+    def fetch(*args):
+        import jana
+
+        return jana.fetch_secret(provider, *args)
+
+    return fetch
+
+
+def cache_key(provider, args):
+    return json.dumps([provider] + [str(a) for a in args])
+
+
+def get_fernet(key=SNAPSHOT_KEY):
+    if not key:
+        return None
+    if Fernet is None:
+        logging.warning(
+            "SECRET_SNAPSHOT_KEY is set but cryptography isn't installed! "
+            "Secrets won't be snapshotted."
+        )
+        return None
+    return Fernet(key)
+
+
+def encode_value(value):
+    if isinstance(value, bytes):
+        return {"binary": True, "value": base64.b64encode(value).decode()}
+    return {"binary": False, "value": value}
+
+
+def decode_value(entry):
+    if entry["binary"]:
+        return base64.b64decode(entry["value"])
+    return entry["value"]
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """
+    Read the encrypted snapshot. Returns {} if there's no usable snapshot.
+    """
+    fernet = get_fernet()
+    if fernet is None or not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, "rb") as fp:
+            return json.loads(fernet.decrypt(fp.read()))
+    except (InvalidToken, ValueError, OSError) as e:
+        logging.warning(f"Ignoring unreadable secrets snapshot: {e}")
+        return {}
+
+
+def write_snapshot(path=SNAPSHOT_PATH):
+    """
+    Write every cached secret to the encrypted snapshot.
+    """
+    fernet = get_fernet()
+    if fernet is None:
+        return
+
+    with CACHE_LOCK:
+        snapshot = {
+            key: {"fetched_at": fetched_at, **encode_value(value)}
+            for key, (fetched_at, value) in CACHE.items()
+        }
+
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.chmod(tmp_path, 0o600)
+    with os.fdopen(fd, "wb") as fp:
+        fp.write(fernet.encrypt(json.dumps(snapshot).encode()))
+    os.replace(tmp_path, path)
+
+
+def fetch(key, fetcher, args, on_refresh=None):
+    """
+    Fetch a secret from its provider and cache it.
+    """
+    value = fetcher(*args)
+    with CACHE_LOCK:
+        CACHE[key] = (time.time(), value)
+
+    try:
+        write_snapshot()
+    except OSError as e:
+        logging.warning(f"Couldn't write secrets snapshot: {e}")
+
+    if on_refresh:
+        on_refresh(value)
+    return value
+
+
+def refresh_in_background(key, fetcher, args, on_refresh=None):
+    """
+    Refresh a secret on a daemon thread, at most once at a time per secret.
+    """
+    with CACHE_LOCK:
+        if key in REFRESHING:
+            return
+        REFRESHING.add(key)
+
+    def run():
+        try:
+            fetch(key, fetcher, args, on_refresh=on_refresh)
+        except Exception as e:
+            logging.error(f"Background secret refresh failed: '{e}'")
+        finally:
+            with CACHE_LOCK:
+                REFRESHING.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_secret(provider, *args, fetcher=None, ttl=SECRET_TTL, on_refresh=None):
+    """
+    Get a secret, from memory or the local snapshot if possible.
+
+    :param str provider: `aws-secretsmanager` or `gcp-secretmanager`.
+    :param args: Arguments identifying the secret (name, project, version).
+    :param callable fetcher: Called with `args` to read the secret from the
+                             provider. Defaults to jana.
+    :param int ttl: Seconds before a cached secret is refreshed.
+    :param callable on_refresh: Called with the new value after a
+                                background refresh.
+    :return str: The secret.
+    """
+    fetcher = fetcher or jana_fetcher(provider)
+    key = cache_key(provider, args)
+
+    with CACHE_LOCK:
+        cached = CACHE.get(key)
+
+    if cached is None:
+        entry = read_snapshot().get(key)
+        if entry is not None:
+            cached = (entry["fetched_at"], decode_value(entry))
+            with CACHE_LOCK:
+                CACHE[key] = cached
+            # A snapshot may be from a previous deploy; always re-check it.
+            refresh_in_background(key, fetcher, args, on_refresh=on_refresh)
+            return cached[1]
+
+    if cached is None:
+        return fetch(key, fetcher, args)
+
+    fetched_at, value = cached
+    if time.time() - fetched_at > ttl:
+        refresh_in_background(key, fetcher, args, on_refresh=on_refresh)
+    return value
@@ -3,14 +3,28 @@ import base64
 import json
 import os
 
+from northface.utils import secret_cache
+
 
 def get_secret(secret_name):
     """
-    Grab a secret
+    Grab a secret, cached in memory (and the local snapshot, if enabled).
 
     :param str secret_name: Name of the secret in secrets manager.
     :return dict: Dict of the secret.
     """
+    return secret_cache.get_secret(
+        "aws-secretsmanager", secret_name, fetcher=fetch_secret
+    )
+
+
+def fetch_secret(secret_name):
+    """
+    Read a secret straight from secrets manager.
+
+    :param str secret_name: Name of the secret in secrets manager.
+    :return str: The secret.
+    """
     region_name = "us-east-1"
     session = boto3.session.Session()
     client = session.client(
@@ -4,6 +4,8 @@ import requests
 
 from datetime import datetime, date, timedelta
 
+__all__ = ["get_bill", "get_this_month", "post_bill_slack"]
+
 
 SLACK_URL = os.environ.get("WHATS_MY_BILL_WHOOK")
 
@@ -4,6 +4,8 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from app import db
 
+__all__ = ["create", "read", "toggle_complete", "delete"]
+
 
 class Categories(enum.Enum):
     DEV = "Development"
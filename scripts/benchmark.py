@@ -0,0 +1,522 @@
+"""
+Cold-start, import-time and memory benchmarks for the API.
+
+Every measurement runs in a fresh interpreter against the `local` blob
+storage backend (seeded with a small fixture dataset), so no cloud
+credentials or network access are needed. Results are written as JSON so
+they can be compared across commits.
+
+`corona-memory` and `corona-chart` aren't part of `all`. The first seeds a
+synthetic multi-year history (--years, --regions) and reports the peak RSS
+of `fetch_plots`; the second times `create_chart` on a synthetic
+200 region x 1000 day frame.
+
+Usage:
+    python scripts/benchmark.py [all|lambda|app|imports|corona-memory|
+                                 corona-chart]
+                                [--runs N] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAMBDA_QUERY = {
+    "resource": "corona",
+    "action": "get_most_recent_date",
+    "params": {},
+}
+APP_PATH = "/corona/date"
+
+CORONA_FIXTURE = (
+    "state,region,last_update,lat,lon,confirmed,deaths,recovered,dt\n"
+    ",Italy,2020-03-0{day}T18:00:00,41.87,12.56,{confirmed},{deaths},5,"
+    "2020-03-0{day}\n"
+    "Hubei,China,2020-03-0{day}T18:00:00,30.97,112.27,{confirmed},{deaths},"
+    "50,2020-03-0{day}\n"
+)
+POLLIN_FIXTURE = (
+    "question_id,poll_id,state,pollster,population,candidate_name,pct,"
+    "start_date,end_date,created_at,dt\n"
+    "1,1,Ohio,YouGov,lv,Joseph R. Biden Jr.,48.0,10/1/20,10/3/20,"
+    "10-04-2020,10-04-2020\n"
+)
+
+
+def seed_data(data_dir):
+    """
+    Write a small fixture dataset for the `local` backend.
+    """
+    corona_dir = os.path.join(data_dir, "corona", "clean")
+    pollin_dir = os.path.join(data_dir, "pollin", "clean")
+    os.makedirs(corona_dir, exist_ok=True)
+    os.makedirs(pollin_dir, exist_ok=True)
+
+    for day in range(1, 4):
+        path = os.path.join(corona_dir, f"03-0{day}-2020.csv")
+        with open(path, "w") as fp:
+            fp.write(
+                CORONA_FIXTURE.format(
+                    day=day, confirmed=100 * day, deaths=10 * day
+                )
+            )
+
+    with open(os.path.join(pollin_dir, "10-04-2020.csv"), "w") as fp:
+        fp.write(POLLIN_FIXTURE)
+
+
+def seed_corona_history(data_dir, years, regions, states=5):
+    """
+    Write a synthetic corona history in the consolidated layout: one
+    Parquet file per month, plus the latest day as a clean CSV.
+    """
+    import numpy as np
+    import pandas as pd
+
+    consolidated_dir = os.path.join(data_dir, "corona", "consolidated")
+    clean_dir = os.path.join(data_dir, "corona", "clean")
+    os.makedirs(consolidated_dir, exist_ok=True)
+    os.makedirs(clean_dir, exist_ok=True)
+
+    rng = np.random.default_rng(0)
+    places = pd.DataFrame(
+        {
+            "region": np.repeat(
+                [f"Region {i}" for i in range(regions)], states
+            ),
+            "state": [f"State {i}" for i in range(regions * states)],
+            "lat": rng.uniform(-60, 60, regions * states).round(4),
+            "lon": rng.uniform(-180, 180, regions * states).round(4),
+        }
+    )
+    days = pd.date_range("2020-01-22", periods=365 * years)
+    for month, month_days in days.groupby(days.strftime("%Y-%m")).items():
+        df = places.loc[places.index.repeat(len(month_days))].copy()
+        df["dt"] = np.tile(month_days.strftime("%Y-%m-%d"), len(places))
+        df["last_update"] = df["dt"] + " 23:00:00"
+        df["confirmed"] = rng.integers(0, 100000, len(df)).astype(float)
+        df["deaths"] = (df["confirmed"] * 0.02).round()
+        df["recovered"] = (df["confirmed"] * 0.5).round()
+        df = df.sort_values(["region", "dt"])
+        df.to_parquet(
+            os.path.join(consolidated_dir, f"{month}.parquet"), index=False
+        )
+
+    latest = days[-1].strftime("%m-%d-%Y")
+    df[df["dt"] == days[-1].strftime("%Y-%m-%d")].to_csv(
+        os.path.join(clean_dir, f"{latest}.csv"), index=False
+    )
+    return len(places) * len(days)
+
+
+def child_env(data_dir):
+    """
+    Environment for a benchmark subprocess: local storage, no secrets
+    provider, in-memory database.
+    """
+    env = dict(os.environ)
+    env.update(
+        {
+            "CLOUD_SERVICE_PROVIDER": "local",
+            "LOCAL_DATA_URI": data_dir,
+            "SQLALCHEMY_CONN_STRING": "sqlite://",
+            "PYTHONPATH": ROOT,
+        }
+    )
+    return env
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process, in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def child_lambda():
+    """
+    Run in a fresh interpreter: import the Lambda handler and serve one
+    event.
+    """
+    import lambda_handler
+
+    event = {"body": json.dumps(LAMBDA_QUERY)}
+    response = lambda_handler.handle(event, None)
+    return {"ok": "body" in response}
+
+
+def child_app():
+    """
+    Run in a fresh interpreter: import the Flask app and serve one request.
+    """
+    from app import app
+
+    response = app.test_client().get(APP_PATH)
+    return {"ok": response.status_code == 200}
+
+
+def child_corona_plots():
+    """
+    Run in a fresh interpreter: render the global corona plots. There's no
+    aggregate yet, so the whole history is loaded.
+    """
+    from northface import corona
+
+    return {"ok": bool(corona.fetch_plots())}
+
+
+def child_corona_history():
+    """
+    Run in a fresh interpreter: load the whole corona history.
+    """
+    from northface import corona
+
+    df = corona._read_data()
+    return {
+        "ok": not df.empty,
+        "rows": len(df),
+        "frame_mb": round(df.memory_usage(deep=True).sum() / 1024 / 1024, 2),
+    }
+
+
+def child_corona_chart(regions=200, days=1000):
+    """
+    Run in a fresh interpreter: time `create_chart` on a synthetic
+    region/day aggregate.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from northface import corona
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "region": np.repeat([f"Region {i}" for i in range(regions)], days),
+            "dt": np.tile(pd.date_range("2020-01-22", periods=days), regions),
+            "confirmed": rng.integers(1001, 100000, regions * days),
+        }
+    )
+    df["deaths"] = df["confirmed"] * 0.02
+    df["recovered"] = df["confirmed"] * 0.5
+    # Shuffled, like rows coming out of several files.
+    df = corona.set_types(df.sample(frac=1, random_state=0))
+    df = corona._add_derived_columns(df)
+
+    started_at = time.perf_counter()
+    chart = corona.create_chart(df)
+    return {
+        "ok": bool(chart),
+        "rows": len(df),
+        "chart_seconds": round(time.perf_counter() - started_at, 4),
+    }
+
+
+CHILDREN = {
+    "lambda": child_lambda,
+    "app": child_app,
+}
+
+
+CORONA_CHILDREN = {
+    "corona_history": child_corona_history,
+    "corona_plots": child_corona_plots,
+    "corona_chart": child_corona_chart,
+}
+
+
+def run_child(target):
+    """
+    Entry point of a benchmark subprocess. Prints one JSON line with the
+    time the first response was ready and the peak RSS.
+    """
+    result = {**CHILDREN, **CORONA_CHILDREN}[target]()
+    result["finished_at"] = time.time()
+    result["peak_rss_mb"] = round(peak_rss_mb(), 2)
+    print(json.dumps(result))
+
+
+def measure_cold_start(target, data_dir, runs):
+    """
+    Spawn `runs` fresh interpreters and time each up to its first response.
+    """
+    samples = []
+    for _ in range(runs):
+        started_at = time.time()
+        process = subprocess.run(  # nosec
+            [sys.executable, os.path.abspath(__file__), "_child", target],
+            env=child_env(data_dir),
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Benchmark for {target} failed:\n{process.stderr}"
+            )
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        samples.append(
+            {
+                "wall_seconds": round(result["finished_at"] - started_at, 4),
+                "peak_rss_mb": result["peak_rss_mb"],
+                "ok": result["ok"],
+            }
+        )
+
+    walls = [s["wall_seconds"] for s in samples]
+    return {
+        "runs": runs,
+        "wall_seconds_median": round(statistics.median(walls), 4),
+        "wall_seconds_min": min(walls),
+        "peak_rss_mb_max": max(s["peak_rss_mb"] for s in samples),
+        "samples": samples,
+    }
+
+
+def parse_importtime(stderr, top=25):
+    """
+    Parse the output of `python -X importtime`.
+
+    :return dict: Total import time plus the slowest top-level packages
+                  and the slowest individual modules.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append(
+            {
+                "module": name.strip(),
+                "depth": depth,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+
+    top_level = {}
+    for module in modules:
+        if module["depth"] == 0:
+            package = module["module"].split(".")[0]
+            top_level[package] = (
+                top_level.get(package, 0) + module["cumulative_ms"]
+            )
+
+    by_package = sorted(top_level.items(), key=lambda x: x[1], reverse=True)
+    by_module = sorted(modules, key=lambda m: m["self_ms"], reverse=True)
+    return {
+        "total_ms": round(sum(top_level.values()), 2),
+        "module_count": len(modules),
+        "packages": [
+            {"package": p, "cumulative_ms": round(ms, 2)}
+            for p, ms in by_package[:top]
+        ],
+        "slowest_modules": [
+            {"module": m["module"], "self_ms": m["self_ms"]}
+            for m in by_module[:top]
+        ],
+    }
+
+
+def measure_imports(target, data_dir):
+    """
+    Per-module import breakdown up to the first response.
+    """
+    process = subprocess.run(  # nosec
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            os.path.abspath(__file__),
+            "_child",
+            target,
+        ],
+        env=child_env(data_dir),
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Import benchmark for {target} failed:\n{process.stderr[-2000:]}"
+        )
+    return parse_importtime(process.stderr)
+
+
+def run_children(target, data_dir, runs):
+    """
+    Spawn `runs` fresh interpreters and collect what each one reports.
+    """
+    samples = []
+    for _ in range(runs):
+        process = subprocess.run(  # nosec
+            [sys.executable, os.path.abspath(__file__), "_child", target],
+            env=child_env(data_dir),
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Benchmark for {target} failed:\n{process.stderr[-2000:]}"
+            )
+        samples.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def measure_memory(target, data_dir, runs):
+    """
+    Spawn `runs` fresh interpreters and report their peak RSS.
+    """
+    samples = run_children(target, data_dir, runs)
+    result = {
+        key: value
+        for key, value in samples[-1].items()
+        if key not in ["ok", "finished_at", "peak_rss_mb"]
+    }
+    result.update(
+        {
+            "runs": runs,
+            "peak_rss_mb_median": statistics.median(
+                s["peak_rss_mb"] for s in samples
+            ),
+            "peak_rss_mb_max": max(s["peak_rss_mb"] for s in samples),
+        }
+    )
+    return result
+
+
+def run_corona_memory(runs, years, regions):
+    """
+    Peak RSS of loading the corona history and rendering its plots.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        rows = seed_corona_history(data_dir, years, regions)
+        return {
+            "years": years,
+            "regions": regions,
+            "rows": rows,
+            "history": measure_memory("corona_history", data_dir, runs),
+            "fetch_plots": measure_memory("corona_plots", data_dir, runs),
+        }
+
+
+def run_corona_chart(runs):
+    """
+    Time `create_chart` on a synthetic region/day aggregate.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        samples = run_children("corona_chart", data_dir, runs)
+    seconds = [s["chart_seconds"] for s in samples]
+    return {
+        "runs": runs,
+        "rows": samples[-1]["rows"],
+        "chart_seconds_median": statistics.median(seconds),
+        "chart_seconds_min": min(seconds),
+    }
+
+
+def run_suite(suite, runs, years=3, regions=200):
+    """
+    Run a benchmark suite and collect the results.
+    """
+    results = {}
+    if suite == "corona-memory":
+        results["corona_memory"] = run_corona_memory(runs, years, regions)
+        return results
+
+    if suite == "corona-chart":
+        results["corona_chart"] = run_corona_chart(runs)
+        return results
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        seed_data(data_dir)
+
+        if suite in ["all", "lambda"]:
+            results["lambda_cold_start"] = measure_cold_start(
+                "lambda", data_dir, runs
+            )
+
+        if suite in ["all", "app"]:
+            results["app_cold_start"] = measure_cold_start(
+                "app", data_dir, runs
+            )
+
+        if suite in ["all", "imports"]:
+            results["imports"] = {
+                target: measure_imports(target, data_dir)
+                for target in CHILDREN.keys()
+            }
+
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(  # nosec
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "_child":
+        return run_child(sys.argv[2])
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "suite",
+        nargs="?",
+        default="all",
+        choices=[
+            "all",
+            "lambda",
+            "app",
+            "imports",
+            "corona-memory",
+            "corona-chart",
+        ],
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--years", type=int, default=3, help="corona-memory history length."
+    )
+    parser.add_argument(
+        "--regions", type=int, default=200, help="corona-memory regions."
+    )
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "results": run_suite(
+            args.suite, args.runs, years=args.years, regions=args.regions
+        ),
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
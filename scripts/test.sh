@@ -9,6 +9,7 @@ flake8
 echo "Evaluating code security..."
 bandit . -r -lll
 
-# Add unit tests...
+echo "Running unit tests..."
+python -m pytest -q tests
 
 echo "That's some well-formatted, safe looking, clean code you got there!"
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Storage locations are read from the environment when the modules are
+# imported, so point everything at a scratch directory first.
+DATA_DIR = tempfile.mkdtemp(prefix="northface-tests-")
+os.environ["CLOUD_SERVICE_PROVIDER"] = "local"
+os.environ["LOCAL_DATA_URI"] = os.path.join(DATA_DIR, "data")
+os.environ["JOBS_DIR"] = os.path.join(DATA_DIR, "jobs")
+os.environ["METRICS_DIR"] = os.path.join(DATA_DIR, "metrics")
+os.environ["PROFILE_DIR"] = os.path.join(DATA_DIR, "profiles")
+os.environ["CACHE_BACKEND"] = "none"
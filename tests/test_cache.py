@@ -0,0 +1,39 @@
+from northface.utils import cache, encoding
+
+
+def test_sizeof_uses_length_of_encoded_payloads():
+    assert cache.sizeof("abc") == 3
+    assert cache.sizeof(b"abcd") == 4
+    assert cache.sizeof(encoding.EncodedJSON('{"a": 1}')) == 8
+
+
+def test_sizeof_scales_up_large_containers():
+    rows = [{"region": "US", "confirmed": 1.0} for _ in range(10000)]
+
+    small = cache.sizeof(rows[:100])
+    large = cache.sizeof(rows)
+
+    assert large > 50 * small
+    assert cache.sizeof({"rows": rows}) > large
+
+
+def test_memory_cache_is_bounded_by_bytes():
+    memory = cache.MemoryCache(max_entries=10, max_bytes=10)
+
+    memory.set("a", "12345", ttl=60)
+    memory.set("b", "123456", ttl=60)
+    memory.set("c", "x" * 11, ttl=60)
+
+    assert memory.get("a") == (False, None)
+    assert memory.get("b") == (True, "123456")
+    assert memory.get("c") == (False, None)
+    assert memory.bytes == 6
+
+
+def test_keys_include_the_version():
+    params = {"b": 1, "a": [1, 2]}
+
+    key = cache.make_key("corona", "fetch_data", params)
+
+    assert key == cache.make_key("corona", "fetch_data", dict(params))
+    assert key != cache.make_key("corona", "fetch_data", params, "01/22/2020")
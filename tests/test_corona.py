@@ -0,0 +1,146 @@
+import json
+
+import pandas as pd
+
+from northface import corona, handlers
+from northface.utils import cache
+
+# The JHU files mix date formats, sometimes within a single file.
+RAW_CSV = (
+    "Province/State,Country/Region,Last Update,Confirmed,Deaths,Recovered\n"
+    ",Italy,2020-03-08T14:53:03,7375,366,622\n"
+    "Hubei,Mainland China,3/8/20 5:31,67707,2986,45235\n"
+    "Washington,US,2020-03-08 21:39:00,102,18,1\n"
+)
+
+
+def write_raw(uri, date_string, data=RAW_CSV):
+    uri.mkdir(parents=True, exist_ok=True)
+    (uri / f"{date_string}.csv").write_text(data)
+
+
+def run_transform(tmp_path, date_string):
+    return corona.transform(
+        date_string,
+        in_uri=str(tmp_path / "raw"),
+        out_uri=str(tmp_path / "clean"),
+        consolidated_uri=str(tmp_path / "consolidated"),
+        aggregate_uri=None,
+        plots_uri=None,
+    )
+
+
+def fetch_records(**kwargs):
+    return json.loads(corona.fetch_data(format="records", **kwargs))
+
+
+def test_set_types_parses_mixed_date_formats():
+    df = pd.DataFrame(
+        {
+            "last_update": [
+                "2020-03-08T14:53:03",
+                "3/8/20 5:31",
+                "2020-03-08 21:39:00",
+                "not a date",
+            ],
+            "confirmed": ["1", "2", "x", None],
+        }
+    )
+
+    df = corona.set_types(df)
+
+    assert str(df["last_update"].dtype).startswith("datetime64")
+    assert df["last_update"].tolist()[:3] == [
+        pd.Timestamp("2020-03-08 14:53:03"),
+        pd.Timestamp("2020-03-08 05:31"),
+        pd.Timestamp("2020-03-08 21:39"),
+    ]
+    assert pd.isna(df["last_update"].iloc[3])
+    assert df["confirmed"].dtype == "float32"
+    assert df["confirmed"].isna().tolist() == [False, False, True, True]
+
+
+def test_transform_normalizes_and_types(tmp_path):
+    write_raw(tmp_path / "raw", "03-08-2020")
+
+    out_uri = run_transform(tmp_path, "03-08-2020")
+
+    df = pd.read_csv(out_uri)
+    assert df.columns.tolist()[:4] == [
+        "region",
+        "state",
+        "last_update",
+        "lat",
+    ]
+    assert df["region"].tolist() == ["Italy", "China", "US"]
+    assert df["dt"].unique().tolist() == ["2020-03-08"]
+    assert df["last_update"].notna().all()
+
+
+def test_consolidated_matches_clean_files(tmp_path):
+    write_raw(tmp_path / "raw", "03-08-2020")
+    write_raw(
+        tmp_path / "raw",
+        "03-09-2020",
+        RAW_CSV.replace("3/8/20", "3/9/20").replace("03-08", "03-09"),
+    )
+    for date_string in ["03-08-2020", "03-09-2020"]:
+        run_transform(tmp_path, date_string)
+    # Reloading a day replaces it instead of appending it again.
+    run_transform(tmp_path, "03-08-2020")
+
+    consolidated = fetch_records(
+        base_uri=str(tmp_path / "clean"),
+        consolidated_uri=str(tmp_path / "consolidated"),
+    )
+    daily = fetch_records(
+        base_uri=str(tmp_path / "clean"),
+        consolidated_uri=None,
+    )
+
+    def key(row):
+        return (row["dt"], row["region"])
+
+    assert len(consolidated) == 6
+    assert sorted(consolidated, key=key) == sorted(daily, key=key)
+    assert all(row["last_update"] for row in consolidated)
+
+
+def test_fetch_data_filters(tmp_path):
+    write_raw(tmp_path / "raw", "03-08-2020")
+    write_raw(tmp_path / "raw", "03-09-2020")
+    for date_string in ["03-08-2020", "03-09-2020"]:
+        run_transform(tmp_path, date_string)
+
+    records = fetch_records(
+        base_uri=str(tmp_path / "clean"),
+        consolidated_uri=str(tmp_path / "consolidated"),
+        country=["Italy", "US"],
+        since="03-08-2020",
+    )
+
+    assert sorted(r["region"] for r in records) == ["Italy", "US"]
+    assert {r["dt"] for r in records} == {"2020-03-09"}
+
+
+def test_cached_data_is_keyed_by_latest_day(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE", cache.MemoryCache())
+    params = {
+        "base_uri": str(tmp_path / "clean"),
+        "consolidated_uri": str(tmp_path / "consolidated"),
+        "format": "records",
+    }
+
+    def fetch_days():
+        response = handlers.execute("corona", "fetch_data", params)
+        return {row["dt"] for row in json.loads(response)}
+
+    write_raw(tmp_path / "raw", "03-08-2020")
+    write_raw(tmp_path / "raw", "03-09-2020")
+    run_transform(tmp_path, "03-08-2020")
+    assert fetch_days() == {"2020-03-08"}
+    assert fetch_days() == {"2020-03-08"}
+    assert cache.STATS["hits"] >= 1
+
+    run_transform(tmp_path, "03-09-2020")
+    assert fetch_days() == {"2020-03-08", "2020-03-09"}
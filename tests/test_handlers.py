@@ -0,0 +1,180 @@
+import contextlib
+import json
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from northface import handlers
+from northface.utils import encoding, jobs
+
+FAKE_SOURCE = """
+from json import dumps
+
+from northface.utils import encoding
+
+__all__ = ["add", "count", "fail"]
+
+
+def add(a, b=1):
+    return {"sum": a + b}
+
+
+@encoding.streaming
+def count(n):
+    return (f"{i}\\n" for i in range(n))
+
+
+def fail():
+    raise ValueError("Nope!")
+
+
+def etl():
+    return "Not over HTTP!"
+
+
+def _helper():
+    pass
+"""
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    module = types.ModuleType("tests_fake_resource")
+    exec(FAKE_SOURCE, module.__dict__)
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setitem(handlers.RESOURCES, "fake", module.__name__)
+    monkeypatch.delitem(handlers.ACTIONS, "fake", raising=False)
+    yield module
+    handlers.ACTIONS.pop("fake", None)
+
+
+def query(action, params=None, **kwargs):
+    return {"resource": "fake", "action": action, "params": params, **kwargs}
+
+
+def wait(job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = jobs.get_status(job_id)
+        if status["status"] in [jobs.SUCCEEDED, jobs.FAILED]:
+            return status
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def test_batch_runs_async_queries_in_context(tmp_path):
+    threads = []
+
+    @contextlib.contextmanager
+    def context():
+        threads.append(threading.current_thread().name)
+        yield
+
+    (tmp_path / "01-22-2020.csv").write_text("dt\n")
+    latest = {
+        "resource": "corona",
+        "action": "get_most_recent_date",
+        "params": {"base_uri": str(tmp_path)},
+    }
+
+    responses = handlers.batch_handler(
+        [latest, {**latest, "async": True}], context=context
+    )
+
+    assert responses[0] == {"result": "01/22/2020", "error": None}
+    status = wait(responses[1]["result"]["job_id"])
+    assert status["status"] == jobs.SUCCEEDED
+    assert any(name.startswith("job") for name in threads)
+
+
+def test_only_exported_functions_are_actions(fake):
+    assert sorted(handlers.get_actions("fake")) == ["add", "count", "fail"]
+    assert sorted(handlers.get_functions(fake, exported_only=False)) == [
+        "add",
+        "count",
+        "etl",
+        "fail",
+    ]
+
+
+def test_module_without_all_exposes_nothing(fake):
+    del fake.__all__
+
+    assert handlers.get_functions(fake) == {}
+    assert "etl" in handlers.get_functions(fake, exported_only=False)
+
+
+def test_dict_handler_dispatches(fake):
+    assert handlers.dict_handler(query("add", {"a": 1})) == {"sum": 2}
+    assert handlers.dict_handler(query("add", {"a": 1, "b": 2})) == {"sum": 3}
+
+
+@pytest.mark.parametrize(
+    "d, message",
+    [
+        ({"resource": "nope", "action": "add", "params": {}}, "Resource"),
+        (query("etl", {}), "Action etl is invalid"),
+        (query("dumps", {}), "Action dumps is invalid"),
+        (query("_helper", {}), "Action _helper is invalid"),
+        (query("add", ["a"]), "Must be a dict"),
+        (query("add", {}), "Expected: add\\(a, b=1\\)"),
+        (query("add", {"a": 1, "c": 2}), "Params are invalid"),
+    ],
+)
+def test_dict_handler_validates(fake, d, message):
+    with pytest.raises(TypeError, match=message):
+        handlers.dict_handler(d)
+
+
+def test_streaming_actions_need_a_stream(fake):
+    with pytest.raises(TypeError, match="streams its results"):
+        handlers.dict_handler(query("count", {"n": 2}))
+    with pytest.raises(TypeError, match="streams its results"):
+        handlers.dict_handler(query("count", {"n": 2}, **{"async": True}))
+
+    chunks = handlers.dict_handler(query("count", {"n": 3}), stream=True)
+
+    assert "".join(chunks) == "0\n1\n2\n"
+
+
+def test_batch_reports_errors_in_place(fake):
+    responses = handlers.batch_handler(
+        [
+            query("add", {"a": 1}),
+            query("fail", {}),
+            query("count", {"n": 1}),
+            "not a query",
+        ]
+    )
+
+    assert responses[0] == {"result": {"sum": 2}, "error": None}
+    assert responses[1] == {"result": None, "error": "Nope!"}
+    assert "streams its results" in responses[2]["error"]
+    assert "Must be a dict" in responses[3]["error"]
+
+
+def test_batch_is_bounded(fake):
+    with pytest.raises(TypeError, match="Too many queries"):
+        handlers.batch_handler([query("add", {"a": 1})] * 3, max_queries=2)
+    with pytest.raises(TypeError, match="Must be a list"):
+        handlers.batch_handler(query("add", {"a": 1}))
+
+
+def test_lambda_runs_async_queries_inline(fake):
+    event = {"body": json.dumps(query("add", {"a": 2}, **{"async": True}))}
+
+    response = handlers.lambda_handler(event, None)
+
+    assert json.loads(response["body"]) == {"sum": 3}
+
+
+def test_lambda_joins_streams(fake):
+    event = {"body": json.dumps(query("count", {"n": 2}))}
+
+    response = handlers.lambda_handler(event, None)
+
+    assert response["body"] == "0\n1\n"
+    assert response["headers"]["Content-Type"] == encoding.NDJSON_MIMETYPE
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+import pytest
+
+from northface.utils import jobs
+
+
+def wait(job_id, jobs_dir, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = jobs.get_status(job_id, jobs_dir)
+        if status["status"] in [jobs.SUCCEEDED, jobs.FAILED]:
+            return status
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def add(a, b):
+    return {"sum": a + b}
+
+
+def fail():
+    raise ValueError("Nope!")
+
+
+def write_status(jobs_dir, job_id, status, age):
+    submitted_at = time.time() - age
+    jobs.write_json(
+        jobs.status_path(job_id, jobs_dir),
+        {
+            "job_id": job_id,
+            "name": "test",
+            "status": status,
+            "submitted_at": submitted_at,
+            "finished_at": (
+                submitted_at
+                if status in [jobs.SUCCEEDED, jobs.FAILED]
+                else None
+            ),
+        },
+    )
+
+
+def test_job_lifecycle(tmp_path):
+    jobs_dir = str(tmp_path)
+
+    status = jobs.submit("test/add", add, {"a": 1, "b": 2}, jobs_dir=jobs_dir)
+
+    assert status["status"] == jobs.PENDING
+    assert wait(status["job_id"], jobs_dir)["status"] == jobs.SUCCEEDED
+    status, result = jobs.get_result(status["job_id"], jobs_dir)
+    assert result == {"sum": 3}
+    assert status["started_at"] <= status["finished_at"]
+
+
+def test_failed_job(tmp_path):
+    jobs_dir = str(tmp_path)
+
+    status = jobs.submit("test/fail", fail, {}, jobs_dir=jobs_dir)
+
+    assert wait(status["job_id"], jobs_dir)["error"] == "Nope!"
+    with pytest.raises(RuntimeError, match="Nope!"):
+        jobs.get_result(status["job_id"], jobs_dir)
+
+
+def test_unknown_job(tmp_path):
+    with pytest.raises(KeyError):
+        jobs.get_status("missing", str(tmp_path))
+
+
+def test_prune_only_drops_finished_jobs(tmp_path):
+    jobs_dir = str(tmp_path)
+    write_status(jobs_dir, "old-pending", jobs.PENDING, age=100)
+    write_status(jobs_dir, "old-running", jobs.RUNNING, age=100)
+    write_status(jobs_dir, "old-done", jobs.SUCCEEDED, age=100)
+    write_status(jobs_dir, "new-done", jobs.FAILED, age=1)
+
+    jobs.prune(jobs_dir, retention_seconds=10, max_stored=100)
+
+    assert sorted(os.listdir(jobs_dir)) == [
+        "new-done.json",
+        "old-pending.json",
+        "old-running.json",
+    ]
+
+
+def test_prune_keeps_at_most_max_stored(tmp_path):
+    jobs_dir = str(tmp_path)
+    for i in range(4):
+        write_status(jobs_dir, f"done-{i}", jobs.SUCCEEDED, age=10 - i)
+    write_status(jobs_dir, "running", jobs.RUNNING, age=20)
+
+    jobs.prune(jobs_dir, retention_seconds=100, max_stored=3)
+
+    assert sorted(os.listdir(jobs_dir)) == [
+        "done-2.json",
+        "done-3.json",
+        "running.json",
+    ]
+
+
+def test_prune_skips_malformed_statuses(tmp_path):
+    jobs_dir = str(tmp_path)
+    jobs.write_json(jobs.status_path("broken", jobs_dir), {"status": "?"})
+
+    jobs.prune(jobs_dir)
+    status = jobs.submit("test/add", add, {"a": 1, "b": 1}, jobs_dir=jobs_dir)
+
+    assert wait(status["job_id"], jobs_dir)["status"] == jobs.SUCCEEDED
+
+
+def test_removed_job_is_not_recreated(tmp_path):
+    jobs_dir = str(tmp_path)
+    write_status(jobs_dir, "gone", jobs.PENDING, age=0)
+    jobs.remove_job("gone", jobs_dir)
+
+    jobs.run("gone", add, {"a": 1, "b": 2}, jobs_dir=jobs_dir)
+
+    assert os.listdir(jobs_dir) == []
+
+
+def test_submit_refuses_jobs_past_max_pending(tmp_path):
+    jobs_dir = str(tmp_path)
+    started = threading.Event()
+    unblock = threading.Event()
+
+    def block():
+        started.set()
+        unblock.wait(10)
+
+    first = jobs.submit("test/block", block, {}, jobs_dir=jobs_dir)
+    started.wait(10)
+    with pytest.raises(jobs.QueueFull):
+        jobs.submit("test/add", add, {"a": 1, "b": 2}, max_pending=1)
+
+    unblock.set()
+    wait(first["job_id"], jobs_dir)
+    # The slot is freed once the job's done.
+    deadline = time.time() + 10
+    while jobs.ACTIVE_JOBS and time.time() < deadline:
+        time.sleep(0.01)
+    status = jobs.submit(
+        "test/add", add, {"a": 1, "b": 2}, jobs_dir=jobs_dir, max_pending=1
+    )
+    assert wait(status["job_id"], jobs_dir)["status"] == jobs.SUCCEEDED
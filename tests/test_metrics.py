@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from northface.utils import metrics
+
+
+@pytest.fixture
+def metrics_dir(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS", {})
+    monkeypatch.setattr(metrics, "LAST_WRITE", 0.0)
+    shutil.rmtree(metrics.METRICS_DIR, ignore_errors=True)
+    os.makedirs(metrics.METRICS_DIR)
+    return metrics.METRICS_DIR
+
+
+def write_file(metrics_dir, pid, count):
+    path = os.path.join(metrics_dir, f"metrics-{pid}-0.json")
+    with open(path, "w") as fp:
+        json.dump([{"resource": "r", "action": "a", **series(count)}], fp)
+    return path
+
+
+def series(count):
+    return {**metrics.new_series(), "count": count}
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_snapshots_are_throttled(metrics_dir, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_WRITE_INTERVAL", 3600)
+
+    metrics.record("r", "a", 0.1)
+    metrics.record("r", "a", 0.2)
+
+    (path,) = os.listdir(metrics_dir)
+    with open(os.path.join(metrics_dir, path)) as fp:
+        assert json.load(fp)[0]["count"] == 1
+    # Collecting writes this process's latest counters first.
+    assert metrics.collect(metrics_dir)[("r", "a")]["count"] == 2
+
+
+def test_collect_merges_live_processes(metrics_dir):
+    write_file(metrics_dir, os.getppid(), 3)
+    metrics.record("r", "a", 0.1, error=True)
+
+    merged = metrics.collect(metrics_dir)
+
+    assert merged[("r", "a")]["count"] == 4
+    assert merged[("r", "a")]["errors"] == 1
+
+
+def test_collect_drops_dead_and_stale_files(metrics_dir):
+    dead = write_file(metrics_dir, dead_pid(), 5)
+    stale = write_file(metrics_dir, os.getppid(), 7)
+    os.utime(stale, (time.time() - 100, time.time() - 100))
+
+    merged = metrics.collect(metrics_dir, ttl=10)
+
+    assert merged == {}
+    assert not os.path.exists(dead)
+    assert not os.path.exists(stale)
+    assert os.listdir(metrics_dir) == [metrics.PROCESS_FILE]
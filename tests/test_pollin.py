@@ -0,0 +1,174 @@
+import io
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from northface import pollin
+
+CANDIDATES = {1: "Joseph R. Biden Jr.", 2: "Donald Trump"}
+COLUMNS = ["candidate_name", "pct", "state", "dt"]
+
+
+def make_polls(questions=5):
+    return pd.DataFrame(
+        [
+            {
+                "question_id": question,
+                "candidate_id": candidate,
+                "candidate_name": name,
+                "pct": 40 + question + candidate,
+                "created_at": f"10/{question}/20 10:00",
+                "end_date": f"10/{question}/20",
+                "state": "Pennsylvania" if question % 2 else "Ohio",
+                "pollster": "Pollster",
+                "population": "lv",
+            }
+            for question in range(1, questions + 1)
+            for candidate, name in CANDIDATES.items()
+        ]
+    )
+
+
+@pytest.fixture
+def uris(tmp_path):
+    os.makedirs(tmp_path / "raw")
+    return {
+        "in_uri_base": str(tmp_path / "raw"),
+        "out_uri_base": str(tmp_path / "clean"),
+        "delta_uri_base": str(tmp_path / "deltas"),
+        "state_uri": str(tmp_path / "state.csv"),
+    }
+
+
+def load(uris, date_string, df):
+    df.to_csv(f"{uris['in_uri_base']}/{date_string}.csv", index=False)
+    return pollin.transform(date_string, **uris)
+
+
+def by_key(df):
+    return df.set_index(pollin.KEY_COLUMNS).sort_index()[COLUMNS]
+
+
+def snapshot(uris):
+    df = pollin._load_snapshot(uris["out_uri_base"], uris["delta_uri_base"])
+    return by_key(df)
+
+
+def streamed(uris):
+    chunks = pollin.stream_data(
+        uris["out_uri_base"], chunksize=3, delta_uri=uris["delta_uri_base"]
+    )
+    lines = io.StringIO("".join(chunks))
+    return by_key(pd.DataFrame([json.loads(line) for line in lines]))
+
+
+def test_first_day_is_a_snapshot(uris):
+    out_uri = load(uris, "10-01-2020", make_polls())
+
+    assert out_uri == f"{uris['out_uri_base']}/10-01-2020.csv"
+    df = snapshot(uris)
+    assert len(df) == 10
+    assert set(df["dt"]) == {"10-01-2020"}
+
+
+def test_changes_are_written_as_deltas(uris):
+    polls = make_polls()
+    load(uris, "10-01-2020", polls)
+
+    # One row changed, one removed and one added.
+    polls.loc[0, "pct"] = 99
+    polls = polls.drop(index=1)
+    polls = pd.concat([polls, make_polls(6).tail(1)], ignore_index=True)
+    out_uri = load(uris, "10-02-2020", polls)
+
+    assert out_uri == f"{uris['delta_uri_base']}/10-02-2020.csv"
+    delta = pd.read_csv(out_uri)
+    assert len(delta) == 3
+    assert delta[pollin.DELETED_COLUMN].sum() == 1
+
+    df = snapshot(uris)
+    expected = by_key(polls.assign(dt="10-01-2020"))
+    changed = [(1, 1), (6, 2)]
+    expected.loc[changed, "dt"] = "10-02-2020"
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    pd.testing.assert_frame_equal(streamed(uris), df, check_dtype=False)
+    latest = pollin.get_most_recent_date(
+        uris["out_uri_base"], uris["delta_uri_base"]
+    )
+    assert latest == "10/02/2020"
+
+
+def test_deltas_are_compacted(uris, monkeypatch):
+    monkeypatch.setattr(pollin, "COMPACT_EVERY", 2)
+    polls = make_polls()
+    load(uris, "10-01-2020", polls)
+    for day in [2, 3]:
+        polls.loc[day, "pct"] = 90 + day
+        assert "deltas" in load(uris, f"10-0{day}-2020", polls)
+
+    polls.loc[4, "pct"] = 94
+    out_uri = load(uris, "10-04-2020", polls)
+
+    assert out_uri == f"{uris['out_uri_base']}/10-04-2020.csv"
+    df = snapshot(uris)
+    # Compacting keeps the day each row last changed.
+    assert df["dt"].tolist() == [
+        "10-01-2020",
+        "10-01-2020",
+        "10-02-2020",
+        "10-03-2020",
+        "10-04-2020",
+        "10-01-2020",
+        "10-01-2020",
+        "10-01-2020",
+        "10-01-2020",
+        "10-01-2020",
+    ]
+    pd.testing.assert_frame_equal(
+        df.drop(columns="dt"),
+        by_key(polls.assign(dt=None)).drop(columns="dt"),
+        check_dtype=False,
+    )
+
+
+def test_big_changes_are_compacted(uris):
+    polls = make_polls()
+    load(uris, "10-01-2020", polls)
+
+    polls["pct"] += 1
+    out_uri = load(uris, "10-02-2020", polls)
+
+    assert out_uri == f"{uris['out_uri_base']}/10-02-2020.csv"
+    assert set(snapshot(uris)["dt"]) == {"10-02-2020"}
+
+
+def test_reloading_an_older_day_keeps_the_latest(uris):
+    polls = make_polls()
+    load(uris, "10-01-2020", polls)
+    polls.loc[0, "pct"] = 99
+    load(uris, "10-02-2020", polls)
+
+    load(uris, "10-01-2020", make_polls())
+
+    assert snapshot(uris).loc[(1, 1), "pct"] == 99
+
+
+def test_query_polls(uris):
+    load(uris, "10-01-2020", make_polls())
+
+    response = json.loads(
+        pollin.query_polls(
+            candidate="donald trump",
+            state="Pennsylvania",
+            start_date="10/2/20",
+            page_size=1,
+            base_uri=uris["out_uri_base"],
+        )
+    )
+
+    assert response["total"] == 2
+    assert [p["question_id"] for p in response["polls"]] == [5]
+    with pytest.raises(ValueError):
+        pollin.query_polls(page=0, base_uri=uris["out_uri_base"])